@@ -6,7 +6,8 @@ from django.core.exceptions import ObjectDoesNotExist
 from django.utils.timezone import now
 
 from bot.api.base import APIClient
-from bot.exceptions import CoinNotFound
+from bot.api.rpc import JSONRPCBatcher
+from bot.exceptions import CoinNotFound, RPCError
 from bot.loader import logger
 from bot.schemas import (
     CoinHistory,
@@ -25,119 +26,143 @@ alchemy_chains = {
 }
 
 
+rpc_batcher = JSONRPCBatcher(
+    f'https://solana-mainnet.g.alchemy.com/v2/{settings.ALCHEMY_API_KEY}/',
+    max_batch_size=settings.ALCHEMY_RPC_BATCH_SIZE,
+    max_wait=settings.ALCHEMY_RPC_BATCH_WAIT,
+)
+
+
 class AlchemyAPI(APIClient):
+    async def rpc(self, method: str, params: list) -> dict:
+        return await rpc_batcher.call(self.session, method, params)
+
     async def get_signatures(
         self,
         address: str,
         *,
         limit: int = 10,
-    ) -> list[str]:
-        async with self.session.post(
-            f'https://solana-mainnet.g.alchemy.com/v2/'
-            f'{settings.ALCHEMY_API_KEY}/',
-            json={
-                'jsonrpc': '2.0',
-                'id': 1,
-                'method': 'getSignaturesForAddress',
-                'params': [
-                    address,
-                    {'limit': limit, 'commitment': 'confirmed'},
-                ],
-            },
-        ) as rsp:
-            data = await rsp.json()
-            logger.debug(data)
+        until: str | None = None,
+        before: str | None = None,
+    ) -> list[str] | None:
+        params = {'limit': limit, 'commitment': 'confirmed'}
+        if until:
+            params['until'] = until
+        if before:
+            params['before'] = before
 
-            if err := data.get('error'):
-                logger.info(f'Error {err}')
-                return []
+        data = await self.rpc('getSignaturesForAddress', [address, params])
 
-            return [i['signature'] for i in data['result']]
+        if err := data.get('error'):
+            logger.info(f'Error {err}')
+            return
+
+        return [i['signature'] for i in data['result']]
+
+    async def get_new_signatures(
+        self,
+        address: str,
+        *,
+        until: str | None = None,
+        limit: int = settings.SIGNATURES_PAGE_SIZE,
+    ) -> list[str] | None:
+        if not until:
+            return await self.get_signatures(address)
+
+        signatures = []
+        before = None
+        while True:
+            page = await self.get_signatures(
+                address,
+                limit=limit,
+                until=until,
+                before=before,
+            )
+            if page is None:
+                return
+
+            signatures.extend(page)
+            if len(page) < limit:
+                return signatures
+            before = page[-1]
 
     async def get_transaction(
         self,
         wallet_address: str,
         signature: str,
     ) -> TransactionData | None:
-        async with self.session.post(
-            f'https://solana-mainnet.g.alchemy.com/v2/'
-            f'{settings.ALCHEMY_API_KEY}/',
-            json={
-                'jsonrpc': '2.0',
-                'id': 1,
-                'method': 'getTransaction',
-                'params': [
-                    signature,
-                    {
-                        'commitment': 'confirmed',
-                        'maxSupportedTransactionVersion': 0,
-                    },
-                ],
-            },
-        ) as rsp:
-            data = await rsp.json()
+        data = await self.rpc(
+            'getTransaction',
+            [
+                signature,
+                {
+                    'commitment': 'confirmed',
+                    'maxSupportedTransactionVersion': 0,
+                },
+            ],
+        )
 
-            if not data.get('result'):
-                logger.info(data)
-                return
+        # unlike an unparseable transaction the call can be retried
+        if err := data.get('error'):
+            raise RPCError('getTransaction', err)
 
-            if err := data['result']['meta'].get('err'):
-                logger.info(err)
-                return
+        if not data.get('result'):
+            logger.info(data)
+            return
 
-            if err := data.get('error'):
-                logger.info(f'Error {err}')
-                return
+        if err := data['result']['meta'].get('err'):
+            logger.info(err)
+            return
 
-            meta = data['result']['meta']
-            token_address = token_address_from_meta(meta)
-            if not token_address:
-                logger.info(f'Token address not found in tx meta: {signature}')
-                return
+        meta = data['result']['meta']
+        token_address = token_address_from_meta(meta)
+        if not token_address:
+            logger.info(f'Token address not found in tx meta: {signature}')
+            return
 
-            balance_change = get_token_balance_change(meta, wallet_address)
-            if balance_change is None:
-                Coin = apps.get_model('core', 'Coin')
-                try:
-                    coin = await Coin.objects.aget_or_create(
-                        token_address,
-                        'solana',
-                    )
-                    balance_change = get_token_balance_change(
-                        meta,
-                        coin.pair_address,
-                    )
-                except (ObjectDoesNotExist, CoinNotFound):
-                    logger.info(f'Coin {token_address} not found')
-                    return
-
-            if balance_change is None:
-                logger.info(
-                    f'[attempt 2] Cannot get balance change '
-                    f'in transaction {signature}',
+        balance_change = get_token_balance_change(meta, wallet_address)
+        if balance_change is None:
+            Coin = apps.get_model('core', 'Coin')
+            try:
+                coin = await Coin.objects.aget_or_create(
+                    token_address,
+                    'solana',
                 )
-
-                for i in meta['preTokenBalances']:
-                    balance_change = get_token_balance_change(meta, i['owner'])
-                    if balance_change:
-                        balance_change = abs(balance_change)
-                        break
-
-            if balance_change is None:
-                logger.info(
-                    f'[attempt 3] Cannot get balance change '
-                    f'in transaction {signature}',
+                balance_change = get_token_balance_change(
+                    meta,
+                    coin.pair_address,
                 )
+            except (ObjectDoesNotExist, CoinNotFound):
+                logger.info(f'Coin {token_address} not found')
                 return
 
-            return TransactionData(
-                wallet_address=wallet_address,
-                token_address=token_address,
-                token_amount=balance_change,
-                timestamp=data['result']['blockTime'],
-                signature=signature,
+        if balance_change is None:
+            logger.info(
+                f'[attempt 2] Cannot get balance change '
+                f'in transaction {signature}',
             )
 
+            for i in meta['preTokenBalances']:
+                balance_change = get_token_balance_change(meta, i['owner'])
+                if balance_change:
+                    balance_change = abs(balance_change)
+                    break
+
+        if balance_change is None:
+            logger.info(
+                f'[attempt 3] Cannot get balance change '
+                f'in transaction {signature}',
+            )
+            return
+
+        return TransactionData(
+            wallet_address=wallet_address,
+            token_address=token_address,
+            token_amount=balance_change,
+            timestamp=data['result']['blockTime'],
+            signature=signature,
+        )
+
     async def get_historical_prices(
         self,
         chain: str,
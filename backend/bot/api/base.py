@@ -1,10 +1,60 @@
-from aiohttp import ClientSession
+import asyncio
+
+from aiohttp import ClientSession, TCPConnector
 from yarl import URL
 
+from bot.settings import settings
+
+
+class SessionRegistry:
+    def __init__(self):
+        self._sessions: dict[
+            str,
+            tuple[asyncio.AbstractEventLoop, ClientSession],
+        ] = {}
+
+    def get(
+        self,
+        name: str,
+        base_url: str | URL | None = None,
+        **session_kwargs,
+    ) -> ClientSession:
+        loop = asyncio.get_running_loop()
+        if name in self._sessions:
+            session_loop, session = self._sessions[name]
+            if session_loop is loop and not session.closed:
+                return session
+
+        session = ClientSession(
+            base_url,
+            connector=TCPConnector(
+                limit=settings.HTTP_POOL_SIZE,
+                limit_per_host=settings.HTTP_PROVIDER_LIMITS.get(
+                    name,
+                    settings.HTTP_POOL_SIZE_PER_HOST,
+                ),
+                ttl_dns_cache=settings.HTTP_DNS_CACHE_TTL,
+                keepalive_timeout=settings.HTTP_KEEPALIVE_TIMEOUT,
+            ),
+            **session_kwargs,
+        )
+        self._sessions[name] = (loop, session)
+        return session
+
+    async def close(self) -> None:
+        sessions = [session for _, session in self._sessions.values()]
+        self._sessions.clear()
+        for session in sessions:
+            await session.close()
+
+
+sessions = SessionRegistry()
+
 
 class APIClient:
     def __init__(self, base_url: str | URL | None = None, **session_kwargs):
-        self.session = ClientSession(
+        self.session = sessions.get(
+            self.__class__.__name__,
             base_url,
             **session_kwargs,
         )
@@ -13,4 +63,4 @@ class APIClient:
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        await self.session.close()
+        pass
@@ -0,0 +1,92 @@
+import asyncio
+from itertools import count
+from typing import Any
+
+from aiohttp import ClientSession
+
+from bot.loader import logger
+
+
+class JSONRPCBatcher:
+    def __init__(self, url: str, *, max_batch_size: int, max_wait: float):
+        self.url = url
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._ids = count(1)
+        self._pending: list[tuple[dict, asyncio.Future]] = []
+        self._session: ClientSession | None = None
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    async def call(
+        self,
+        session: ClientSession,
+        method: str,
+        params: list[Any],
+    ) -> dict:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._session = session
+        self._pending.append(
+            (
+                {
+                    'jsonrpc': '2.0',
+                    'id': next(self._ids),
+                    'method': method,
+                    'params': params,
+                },
+                future,
+            ),
+        )
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif not self._timer:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        task = asyncio.create_task(self._send(self._session, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(
+        self,
+        session: ClientSession,
+        batch: list[tuple[dict, asyncio.Future]],
+    ) -> None:
+        futures = {payload['id']: future for payload, future in batch}
+        try:
+            async with session.post(
+                self.url,
+                json=[payload for payload, _ in batch],
+            ) as rsp:
+                data = await rsp.json()
+                logger.debug(data)
+        except Exception as e:
+            for future in futures.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        # the whole batch was rejected, e.g. because of rate limit
+        if isinstance(data, dict):
+            data = [{**data, 'id': i} for i in futures]
+
+        for i in data:
+            future = futures.pop(i.get('id'), None)
+            if future and not future.done():
+                future.set_result(i)
+
+        for future in futures.values():
+            if not future.done():
+                future.set_result({'error': 'Missing response in batch'})
@@ -0,0 +1,98 @@
+import time
+from collections import OrderedDict
+from collections.abc import Hashable
+from typing import Any
+
+from bot.api.alchemy import alchemy_chains
+from bot.exceptions import CoinNotFound
+from bot.settings import settings
+
+
+class TTLCache:
+    def __init__(self, ttl: float, *, maxsize: int | None = None):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        if key not in self._data:
+            return default
+
+        expires_at, value = self._data[key]
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return default
+
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None):
+        if ttl is None:
+            ttl = self.ttl
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+
+        if self.maxsize and len(self._data) > self.maxsize:
+            self.clear_expired()
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear_expired(self) -> None:
+        now = time.monotonic()
+        self._data = OrderedDict(
+            (k, v) for k, v in self._data.items() if v[0] >= now
+        )
+
+
+_not_found = object()
+
+
+class CoinCache:
+    """Coins by (chain, address), including the ones that do not exist."""
+
+    def __init__(
+        self,
+        *,
+        maxsize: int = settings.COIN_CACHE_SIZE,
+        ttl: float = settings.COIN_CACHE_TTL,
+        negative_ttl: float = settings.COIN_CACHE_NEGATIVE_TTL,
+    ):
+        self.negative_ttl = negative_ttl
+        self._coins = TTLCache(ttl, maxsize=maxsize)
+
+    @staticmethod
+    def _get_key(chain: str, address: str) -> tuple[str, str]:
+        # coins are stored with alchemy chain names, e.g. solana-mainnet
+        return alchemy_chains.get(chain, chain), address
+
+    def get(self, chain: str, address: str):
+        coin = self._coins.get(self._get_key(chain, address))
+        if coin is _not_found:
+            raise CoinNotFound(address=address)
+        return coin
+
+    def get_many(self, chain: str, addresses: list[str]) -> tuple[dict, list]:
+        coins, missing = {}, []
+        for address in addresses:
+            coin = self._coins.get(self._get_key(chain, address))
+            if coin is None:
+                missing.append(address)
+            elif coin is not _not_found:
+                coins[address] = coin
+        return coins, missing
+
+    def set(self, coin) -> None:
+        self._coins.set(self._get_key(coin.chain, coin.address), coin)
+
+    def set_not_found(self, chain: str, address: str) -> None:
+        self._coins.set(
+            self._get_key(chain, address),
+            _not_found,
+            self.negative_ttl,
+        )
+
+
+coin_cache = CoinCache()
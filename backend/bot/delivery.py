@@ -0,0 +1,308 @@
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramRetryAfter,
+)
+
+from bot.loader import bot, logger
+from bot.settings import settings
+
+MESSAGE_MAX_LENGTH = 4096
+MESSAGES_SEPARATOR = f'\n\n{"—" * 10}\n\n'
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity,
+            self.tokens + (now - self.updated_at) * self.rate,
+        )
+        self.updated_at = now
+
+    @property
+    def is_full(self) -> bool:
+        self._refill()
+        return self.tokens >= self.capacity
+
+    def delay(self) -> float:
+        self._refill()
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self) -> None:
+        self._refill()
+        self.tokens -= 1
+
+    def pause(self, seconds: float) -> None:
+        self._refill()
+        self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+    async def acquire(self) -> None:
+        while delay := self.delay():
+            await asyncio.sleep(delay)
+        self.consume()
+
+
+@dataclass
+class OutgoingMessage:
+    chat_id: int | str
+    text: str
+    future: asyncio.Future
+    coalesce: bool = False
+    created_at: float = field(default_factory=time.monotonic)
+    attempts: int = 0
+
+
+@dataclass
+class ChatQueue:
+    bucket: TokenBucket
+    messages: deque[OutgoingMessage] = field(default_factory=deque)
+    scheduled: bool = False
+
+
+@dataclass
+class DeliveryStats:
+    requests: int = 0
+    sent: int = 0
+    dropped: int = 0
+    retried: int = 0
+    latency_total: float = 0
+    latency_max: float = 0
+
+    @property
+    def latency_avg(self) -> float:
+        if not self.sent:
+            return 0
+        return self.latency_total / self.sent
+
+
+class Delivery:
+    def __init__(
+        self,
+        *,
+        workers: int = settings.DELIVERY_WORKERS,
+        rate: float = settings.DELIVERY_RATE,
+        max_size: int = settings.DELIVERY_QUEUE_SIZE,
+    ):
+        self.workers = workers
+        self.max_size = max_size
+        self.pending = 0
+        self.stats = DeliveryStats()
+        self._bucket = TokenBucket(rate, rate)
+        self._chats: dict[int | str, ChatQueue] = {}
+        self._ready: asyncio.Queue[int | str] | None = None
+        self._tasks: list[asyncio.Task] = []
+
+    @property
+    def is_running(self) -> bool:
+        return bool(self._tasks)
+
+    def set_rate(self, rate: float) -> None:
+        self._bucket.rate = rate
+        self._bucket.capacity = rate
+
+    def start(self) -> None:
+        if self.is_running:
+            return
+
+        self._ready = asyncio.Queue()
+        self._tasks = [
+            asyncio.create_task(self._worker()) for _ in range(self.workers)
+        ]
+        self._tasks.append(asyncio.create_task(self._report_stats()))
+        for chat_id, chat in self._chats.items():
+            chat.scheduled = False
+            self._schedule(chat_id, chat)
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self.log_stats()
+
+    def submit(
+        self,
+        chat_id: int | str,
+        text: str,
+        *,
+        coalesce: bool = False,
+    ) -> asyncio.Future[bool]:
+        future = asyncio.get_running_loop().create_future()
+        if self.pending >= self.max_size:
+            logger.warning(
+                f'Delivery queue is full, message to user (id={chat_id}) '
+                f'was dropped',
+            )
+            self.stats.dropped += 1
+            future.set_result(False)
+            return future
+
+        if chat_id not in self._chats:
+            self._chats[chat_id] = ChatQueue(self._get_chat_bucket(chat_id))
+
+        chat = self._chats[chat_id]
+        chat.messages.append(
+            OutgoingMessage(chat_id, text, future, coalesce=coalesce),
+        )
+        self.pending += 1
+
+        if not self.is_running:
+            self.start()
+        self._schedule(chat_id, chat)
+        return future
+
+    async def send(
+        self,
+        chat_id: int | str,
+        text: str,
+        *,
+        coalesce: bool = False,
+    ) -> bool:
+        return await self.submit(chat_id, text, coalesce=coalesce)
+
+    def log_stats(self) -> None:
+        logger.info(
+            f'Delivery stats: queue_depth={self.pending}, '
+            f'requests={self.stats.requests}, '
+            f'sent={self.stats.sent}, dropped={self.stats.dropped}, '
+            f'retried={self.stats.retried}, '
+            f'latency_avg={self.stats.latency_avg:.2f}s, '
+            f'latency_max={self.stats.latency_max:.2f}s',
+        )
+
+    @staticmethod
+    def _get_chat_bucket(chat_id: int | str) -> TokenBucket:
+        if int(chat_id) < 0:
+            return TokenBucket(settings.DELIVERY_GROUP_RATE)
+        return TokenBucket(settings.DELIVERY_CHAT_RATE)
+
+    def _schedule(self, chat_id: int | str, chat: ChatQueue) -> None:
+        if chat.scheduled or not chat.messages:
+            return
+
+        chat.scheduled = True
+        delay = chat.bucket.delay()
+        if chat.messages[0].coalesce:
+            # give the other events of this cycle a chance to be merged
+            delay = max(
+                delay,
+                chat.messages[0].created_at
+                + settings.DELIVERY_COALESCE_WINDOW
+                - time.monotonic(),
+            )
+
+        if delay > 0:
+            asyncio.get_running_loop().call_later(
+                delay,
+                self._ready.put_nowait,
+                chat_id,
+            )
+        else:
+            self._ready.put_nowait(chat_id)
+
+    async def _worker(self) -> None:
+        while True:
+            chat_id = await self._ready.get()
+            chat = self._chats[chat_id]
+
+            await self._bucket.acquire()
+            chat.bucket.consume()
+            batch = self._pop_batch(chat)
+            self.pending -= len(batch)
+
+            await self._send(chat_id, chat, batch)
+            chat.scheduled = False
+            self._schedule(chat_id, chat)
+
+    @staticmethod
+    def _pop_batch(chat: ChatQueue) -> list[OutgoingMessage]:
+        batch = [chat.messages.popleft()]
+        if not batch[0].coalesce:
+            return batch
+
+        length = len(batch[0].text)
+        while chat.messages and chat.messages[0].coalesce:
+            length += len(MESSAGES_SEPARATOR) + len(chat.messages[0].text)
+            if length > MESSAGE_MAX_LENGTH:
+                break
+            batch.append(chat.messages.popleft())
+        return batch
+
+    async def _send(
+        self,
+        chat_id: int | str,
+        chat: ChatQueue,
+        batch: list[OutgoingMessage],
+    ) -> None:
+        try:
+            await bot.send_message(
+                chat_id,
+                MESSAGES_SEPARATOR.join(i.text for i in batch),
+            )
+        except TelegramRetryAfter as e:
+            logger.info(
+                f'Cannot send a message to user (id={chat_id}) '
+                f'because of rate limit',
+            )
+            self._bucket.pause(e.retry_after)
+            batch[0].attempts += 1
+            if batch[0].attempts < settings.DELIVERY_MAX_ATTEMPTS:
+                self.stats.retried += 1
+                chat.messages.extendleft(reversed(batch))
+                self.pending += len(batch)
+                return
+            self._drop(batch)
+        except (TelegramBadRequest, TelegramForbiddenError) as e:
+            logger.info(
+                f'Cannot send a message to user (id={chat_id}) '
+                f'because of {e.__class__.__name__} error: {str(e)}',
+            )
+            self._drop(batch)
+        except Exception as e:
+            logger.exception(
+                f'Cannot send a message to user (id={chat_id})',
+                exc_info=e,
+            )
+            self._drop(batch)
+        else:
+            self.stats.requests += 1
+            for msg in batch:
+                latency = time.monotonic() - msg.created_at
+                self.stats.sent += 1
+                self.stats.latency_total += latency
+                self.stats.latency_max = max(self.stats.latency_max, latency)
+                if not msg.future.done():
+                    msg.future.set_result(True)
+
+    def _drop(self, batch: list[OutgoingMessage]) -> None:
+        self.stats.dropped += len(batch)
+        for msg in batch:
+            if not msg.future.done():
+                msg.future.set_result(False)
+
+    async def _report_stats(self) -> None:
+        while True:
+            await asyncio.sleep(settings.DELIVERY_STATS_INTERVAL)
+            self._chats = {
+                k: v
+                for k, v in self._chats.items()
+                if v.messages or v.scheduled or not v.bucket.is_full
+            }
+            self.log_stats()
+
+
+delivery = Delivery()
@@ -24,3 +24,12 @@ class BirdEyeBadRequest(Exception):
 
     def __str__(self):
         return self.message
+
+
+class RPCError(Exception):
+    def __init__(self, method: str, error):
+        self.method = method
+        self.error = error
+
+    def __str__(self):
+        return f'{self.method} failed: {self.error}'
@@ -4,6 +4,7 @@ from aiogram.filters import Command
 from aiogram.types import CallbackQuery, Message
 
 from bot.keyboards.inline import alerts_kb
+from bot.services.invalidation import invalidation
 from core.models import Client
 
 router = Router()
@@ -22,6 +23,8 @@ async def toggle_alerts(query: CallbackQuery):
     await Client.objects.filter(pk=query.message.chat.id).aupdate(
         alerts_enabled=alerts_enabled,
     )
+    await invalidation.refresh_alerts(query.message.chat.id)
+    await invalidation.refresh_subscribers(query.message.chat.id)
 
     try:
         alerts_status = 'включены' if alerts_enabled else 'выключены'
@@ -3,9 +3,8 @@ from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import Command, StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.types import CallbackQuery, Message
-from django.db import IntegrityError
+from django.db import IntegrityError, models
 
-from bot.api.alchemy import AlchemyAPI
 from bot.exceptions import CoinNotFound
 from bot.keyboards.inline import (
     cancel_kb,
@@ -14,6 +13,8 @@ from bot.keyboards.inline import (
     get_coins_list_keyboard,
 )
 from bot.keyboards.utils import one_button_keyboard
+from bot.services.invalidation import invalidation
+from bot.services.prices import price_oracle
 from bot.states import CoinState
 from core.models import ClientCoin, Coin, CoinTrackingParams
 
@@ -39,6 +40,7 @@ async def add_or_update_coin(msg: Message, state: FSMContext):
                 client_id=msg.chat.id,
                 coin_id=coin_id,
             )
+            await invalidation.refresh_alerts(msg.chat.id)
         else:
             coin = await Coin.objects.add_to_client(
                 address,
@@ -137,10 +139,12 @@ async def edit_coin(query: CallbackQuery, state: FSMContext):
 
 @router.callback_query(F.data == 'delete_coin')
 async def delete_coin(query: CallbackQuery, state: FSMContext):
+    coin_id = await state.get_value('coin_id')
     await ClientCoin.objects.filter(
-        coin_id=await state.get_value('coin_id'),
+        coin_id=coin_id,
         client_id=query.message.chat.id,
     ).adelete()
+    await invalidation.refresh_alerts(query.message.chat.id, coin_id)
 
     await state.update_data(coin_id=None, coin_address=None)
     await query.message.edit_text(
@@ -195,8 +199,7 @@ async def set_coin_percentage_2(msg: Message, state: FSMContext):
         return
 
     coin = await Coin.objects.aget(pk=await state.get_value('coin_id'))
-    async with AlchemyAPI() as api:
-        coin_price = await api.get_coin_price(coin.chain, coin.address)
+    coin_price = await price_oracle.get_price(coin.chain, coin.address)
 
     tracking_param = (
         CoinTrackingParams.PRICE_UP
@@ -212,7 +215,9 @@ async def set_coin_percentage_2(msg: Message, state: FSMContext):
         tracking_param=tracking_param,
         percentage=abs(percentage),
         notification_sent=False,
+        arm_epoch=models.F('arm_epoch') + 1,
     )
+    await invalidation.refresh_alerts(msg.chat.id, coin.pk)
 
     await msg.answer(
         f'Теперь отслеживаемое изменение цены этой монеты: '
@@ -236,7 +241,12 @@ async def toggle_tracking_params(
     await ClientCoin.objects.filter(
         coin_id=coin_id,
         client_id=query.message.chat.id,
-    ).aupdate(tracking_param=query.data, notification_sent=False)
+    ).aupdate(
+        tracking_param=query.data,
+        notification_sent=False,
+        arm_epoch=models.F('arm_epoch') + 1,
+    )
+    await invalidation.refresh_alerts(query.message.chat.id, coin_id)
     tracking_param = CoinTrackingParams(query.data).label
 
     try:
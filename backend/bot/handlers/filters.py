@@ -8,6 +8,7 @@ from aiogram.types import CallbackQuery, Message
 
 from bot.keyboards.inline import filters_kb, to_filters_kb
 from bot.parse import parse_message
+from bot.services.invalidation import invalidation
 from bot.states import FiltersState
 from bot.text_utils import age_to_str, parse_age, price_to_str
 from core.models import Client
@@ -87,6 +88,7 @@ async def set_filter(
     await Client.objects.filter(pk=msg.chat.id).aupdate(
         **{field: value},
     )
+    await invalidation.refresh_subscribers(msg.chat.id)
 
     await state.clear()
     await msg.answer(
@@ -1,5 +1,4 @@
 from collections.abc import Callable
-from dataclasses import asdict
 from typing import Any
 
 from aiogram import F, Router
@@ -11,14 +10,11 @@ from bot.api.birdeye import BirdEyeAPI
 from bot.keyboards.inline import cancel_kb, search_kb, to_search_kb
 from bot.parse import parse_message
 from bot.schemas import TokenListParams
-from bot.services.client_filters import (
-    add_date_to_coins,
-    filter_results,
-    get_and_filter_results,
-)
+from bot.services.client_filters import filter_results, get_results
+from bot.services.seen_coins import seen_coins
 from bot.states import SearchState
 from bot.text_utils import parse_age
-from core.models import ClientFilters
+from core.models import ClientFilters, SearchResult
 
 router = Router()
 
@@ -42,29 +38,16 @@ async def set_search_filter(
         await msg.answer(error_text, reply_markup=to_search_kb)
         return
 
-    extra_data = {}
-    data = await state.get_data()
-    f = await ClientFilters.objects.get_by_id(msg.chat.id)
-
     if field == 'min_liquidity':
         async with BirdEyeAPI() as api:
-            results = await get_and_filter_results(
+            results = await get_results(
                 api,
-                f,
                 TokenListParams(min_liquidity=value),
             )
-            extra_data = {'results': [asdict(i) for i in results]}
-
-    if field in ('min_age', 'max_age') and not data.get('ages_is_set', False):
-        results = await add_date_to_coins(f.results)
-        await state.update_data(ages_is_set=True)
-        extra_data = {'results': results}
+        await SearchResult.objects.replace(msg.chat.id, results)
+        await seen_coins.add(msg.chat.id, [i['coin_id'] for i in results])
 
-    await ClientFilters.objects.update_by_id(
-        msg.chat.id,
-        **{field: value},
-        **extra_data,
-    )
+    await ClientFilters.objects.update_by_id(msg.chat.id, **{field: value})
 
     await msg.answer(**await get_search_menu_data(msg.chat.id))
     await state.set_state()
@@ -72,10 +55,15 @@ async def set_search_filter(
 
 async def get_search_menu_data(client_id: int | str):
     filters = await ClientFilters.objects.get_by_id(client_id)
-    results = filter_results(filters)
+    results = filter_results(
+        filters,
+        await SearchResult.objects.get_rows(client_id),
+        return_str=False,
+    )
     return {
         'text': (
             f'Найдено {len(results)} монет.\n'
+            f'Всего показано монет: {await seen_coins.count(client_id)}\n'
             f'Фильтры:\n{filters.message_text}\n'
             f'Вы можете установить дополнительные фильтры ниже'
         ),
@@ -104,15 +92,17 @@ async def set_min_liquidity(msg: Message, state: FSMContext):
         return
 
     async with BirdEyeAPI() as api:
-        results = await api.get_token_list(
+        results = await get_results(
+            api,
             TokenListParams(min_liquidity=min_liquidity),
         )
 
     await ClientFilters.objects.acreate(
         client_id=msg.chat.id,
         min_liquidity=min_liquidity,
-        results=[asdict(i) for i in results],
     )
+    await SearchResult.objects.add(msg.chat.id, results)
+    await seen_coins.add(msg.chat.id, [i['coin_id'] for i in results])
     await msg.answer(**await get_search_menu_data(msg.chat.id))
     await state.set_state()
 
@@ -173,7 +163,12 @@ async def set_extra_filters(msg: Message, state: FSMContext):
 @router.callback_query(F.data == 'show_search_results')
 async def show_search_results(query: CallbackQuery):
     filters = await ClientFilters.objects.get_by_id(query.message.chat.id)
-    results = '\n'.join(filter_results(filters))
+    results = '\n'.join(
+        filter_results(
+            filters,
+            await SearchResult.objects.get_rows(query.message.chat.id),
+        ),
+    )
 
     await query.message.edit_text(
         f'Результаты поиска:\n{results[:4000]}',
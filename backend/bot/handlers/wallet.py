@@ -11,6 +11,7 @@ from bot.keyboards.inline import (
     wallet_kb,
 )
 from bot.keyboards.utils import one_button_keyboard
+from bot.services.invalidation import invalidation
 from bot.states import WalletState
 from core.models import ClientWallet, Wallet
 
@@ -52,6 +53,7 @@ async def add_or_update_wallet(msg: Message, state: FSMContext):
         text = 'Такого кошелька не существует'
     else:
         text = f'Кошелёк {wallet.address} добавлен'
+        await invalidation.refresh_subscribers(msg.chat.id)
 
     await state.clear()
     await msg.answer(
@@ -124,6 +126,7 @@ async def delete_wallet(query: CallbackQuery, state: FSMContext):
         wallet_id=await state.get_value('wallet_id'),
         client_id=query.message.chat.id,
     ).adelete()
+    await invalidation.refresh_subscribers(query.message.chat.id)
 
     await state.update_data(wallet_id=None)
     await query.message.edit_text(
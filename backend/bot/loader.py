@@ -3,6 +3,7 @@ import logging
 
 from aiogram import Bot, Dispatcher
 from aiogram.fsm.storage.redis import RedisStorage
+from redis.asyncio import Redis
 
 from bot.settings import settings
 
@@ -10,5 +11,6 @@ logger = logging.getLogger('bot')
 loop = asyncio.get_event_loop()
 
 bot = Bot(settings.BOT_TOKEN)
-storage = RedisStorage.from_url(settings.REDIS_URL)
+redis = Redis.from_url(settings.REDIS_URL)
+storage = RedisStorage(redis)
 dp = Dispatcher(storage=storage)
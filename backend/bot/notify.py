@@ -1,72 +1,52 @@
 import asyncio
 import time
 from asyncio import ALL_COMPLETED
-from collections.abc import Callable, Coroutine
 from dataclasses import asdict
 from datetime import UTC, datetime
+from functools import reduce
 from itertools import groupby
-from typing import Any
+from operator import or_
 
-from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
 from asgiref.sync import sync_to_async
-from django.contrib.postgres.aggregates import ArrayAgg
-from django.db.models import ExpressionWrapper, F, FloatField, Q
+from django.db.models import Min, Q
 
 from bot.api.alchemy import AlchemyAPI
 from bot.api.birdeye import BirdEyeAPI
 from bot.api.dexscreener import DexscreenerAPI
-from bot.exceptions import BirdEyeBadRequest, CoinNotFound
-from bot.loader import bot, logger, loop
+from bot.cache import coin_cache
+from bot.exceptions import CoinNotFound
+from bot.loader import logger
+from bot.outbox import Notification, outbox
+from bot.pipeline import run_pool
 from bot.schemas import (
     CoinHistory,
+    CoinInfo,
     CoinInputData,
     CoinPrice,
     HistoricalPrice,
-    TokenListParams,
     TransactionData,
 )
-from bot.services.client_filters import (
-    filter_results,
-    get_and_filter_results,
-)
+from bot.services.alerts import alert_index
+from bot.services.client_filters import TokenColumns, filter_results
+from bot.services.prices import price_oracle
+from bot.services.seen_coins import seen_coins
+from bot.services.signatures import seen_signatures
+from bot.services.subscribers import subscriber_matrix
+from bot.services.token_universe import token_universe
+from bot.services.wallet_polling import wallet_poller
+from bot.services.wallet_stream import wallet_stream
 from bot.settings import settings
-from bot.text_utils import chunk_list
+from bot.sharding import get_hash, sharding
 from core.models import (
-    Client,
     ClientCoin,
     ClientFilters,
     Coin,
-    CoinTrackingParams,
+    SearchResult,
     Transaction,
     Wallet,
 )
 
 
-def handle_send_message_errors(send_message_func):
-    async def decorator(chat_id: str | int, text: str):
-        try:
-            await send_message_func(chat_id, text)
-        except TelegramRetryAfter as e:
-            logger.info(
-                f'Cannot send a message to user (id={chat_id}) '
-                f'because of rate limit',
-            )
-            await asyncio.sleep(e.retry_after)
-            await send_message_func(chat_id, text)
-        except TelegramBadRequest as e:
-            logger.info(
-                f'Cannot send a message to user (id={chat_id}) '
-                f'because of {e.__class__.__name__} error: {str(e)}',
-            )
-
-    return decorator
-
-
-@handle_send_message_errors
-async def safe_send_message(chat_id: int | str, text: str):
-    await bot.send_message(chat_id, text)
-
-
 async def asyncio_wait(
     fs,
     *,
@@ -79,167 +59,214 @@ async def asyncio_wait(
 
 
 async def send_coin_message(coin_price: CoinPrice):
-    coin = await Coin.objects.aget(
-        address=coin_price.address,
-        chain=coin_price.chain,
-    )
-
-    clients = Client.objects.filter(
-        Q(
-            coins__tracking_param=CoinTrackingParams.PRICE_UP,
-            coins__percentage__lte=ExpressionWrapper(
-                (coin_price.price - F('coins__start_price'))
-                / F('coins__start_price')
-                * 100,
-                output_field=FloatField(),
-            ),
-        )
-        | Q(
-            coins__tracking_param=CoinTrackingParams.PRICE_DOWN,
-            coins__percentage__gte=ExpressionWrapper(
-                (F('coins__start_price') - coin_price.price)
-                / F('coins__start_price')
-                * 100,
-                output_field=FloatField(),
-            ),
-        ),
-        coins__coin__address=coin_price.address,
-        coins__notification_sent=False,
-        alerts_enabled=True,
+    alerts, clients = alert_index.get_triggered(
+        coin_price.address,
+        coin_price.chain,
+        coin_price.price,
     )
+    if not clients:
+        return
 
-    text = f'Цена монеты {coin.symbol} достигла ${coin_price.price}'
-    await asyncio_wait(
+    text = f'Цена монеты {alerts.symbol} достигла ${coin_price.price}'
+    # a restart before notification_sent is saved arms the same epoch
+    # again, so the repeated notifications are skipped by the outbox
+    await outbox.put(
         [
-            asyncio.create_task(safe_send_message(c.pk, text))
-            async for c in clients
+            Notification(f'coin:{alerts.coin_id}:{i}:{epoch}', i, text)
+            for i, epoch in clients
         ],
     )
-
-    await ClientCoin.objects.filter(client__in=clients, coin=coin).aupdate(
+    # the alerts are kept armed until the notifications are stored
+    alert_index.remove_triggered(alerts, clients)
+
+    # an alert armed again since it was triggered is left armed
+    await ClientCoin.objects.filter(
+        reduce(or_, (Q(client_id=i, arm_epoch=epoch) for i, epoch in clients)),
+        coin_id=alerts.coin_id,
+    ).aupdate(
         notification_sent=True,
     )
 
 
 async def notify_coins_prices_changes():
-    async def _notify(_api: AlchemyAPI, addresses: list[str], chain: str):
-        logger.info(
-            f'Starting notify_coins_prices_changes '
-            f'with {len(addresses)} addresses on chain {chain}...',
-        )
+    if not alert_index.loaded:
+        await alert_index.load()
+
+    coins = [
+        CoinInputData(chain, address)
+        for address, chain in alert_index.coins()
+        if sharding.owns(f'coin:{chain}:{address}')
+    ]
+    logger.info(
+        f'Starting notify_coins_prices_changes with {len(coins)} coins...',
+    )
 
-        addresses = chunk_list(addresses, 25)
-        await asyncio_wait(
-            [
-                asyncio.create_task(send_coin_message(coin_price))
-                for addresses_chunk in addresses
-                for coin_price in await _api.get_coins_prices(
-                    CoinInputData.from_network(chain, addresses_chunk),
-                )
-            ],
-        )
+    async def iter_prices():
+        async for prices in price_oracle.iter_prices(coins):
+            for coin_price in prices:
+                yield coin_price
 
-    async with AlchemyAPI() as api:
-        await asyncio_wait(
-            [
-                asyncio.create_task(_notify(api, **coin))
-                async for coin in Coin.objects.filter(
-                    clients__isnull=False,
-                    clients__client__alerts_enabled=True,
-                )
-                .values('chain')
-                .annotate(addresses=ArrayAgg('address', distinct=True))
-            ],
-        )
+    await run_pool(
+        send_coin_message,
+        iter_prices(),
+        workers=settings.NOTIFY_COINS_WORKERS,
+    )
 
 
-async def get_wallet_new_transactions(
+async def get_wallet_transactions(
     api: AlchemyAPI,
     wallet: Wallet,
-) -> list[TransactionData]:
-    async def get_transaction(_tx: str):
-        tr = await api.get_transaction(wallet.address, _tx)
-        if not tr:
-            await Transaction.objects.acreate(wallet=wallet, signature=_tx)
-        return tr
-
-    transactions = await api.get_signatures(wallet.address)
-    already_sent_transactions = await sync_to_async(
-        lambda: list(
-            Transaction.objects.filter(
-                wallet=wallet,
-                signature__in=transactions,
+    signatures: list[str],
+) -> tuple[list[TransactionData], list[str], bool]:
+    new_transactions = await seen_signatures.filter_unseen(
+        wallet.pk,
+        signatures,
+    )
+    wallet_poller.spend(len(new_transactions))
+    tasks = {
+        tx: asyncio.create_task(api.get_transaction(wallet.address, tx))
+        for tx in new_transactions
+    }
+    await asyncio_wait(list(tasks.values()))
+
+    # failed signatures are left out, so they are fetched again next time
+    results = []
+    fetched = []
+    for signature, task in tasks.items():
+        if task.exception():
+            logger.info(
+                f'Cannot get transaction {signature}: {task.exception()!r}',
             )
-            .order_by('-date')
-            .values_list('signature', flat=True)[:20],
-        ),
-    )()
+            continue
+        fetched.append(signature)
+        if tx := task.result():
+            tx.wallet_id = wallet.pk
+            results.append(tx)
+    return results, fetched, len(fetched) == len(new_transactions)
+
+
+async def get_wallet_new_transactions(
+    api: AlchemyAPI,
+    wallet: Wallet,
+) -> tuple[Wallet, list[TransactionData], list[str]]:
+    started_at = time.monotonic()
+    try:
+        signatures = await api.get_new_signatures(
+            wallet.address,
+            until=wallet.last_signature,
+        )
+    except Exception:
+        wallet_poller.record_failure(wallet.pk)
+        raise
+    if signatures is None:
+        wallet_poller.record_failure(wallet.pk)
+        return wallet, [], []
+
+    wallet_poller.record(
+        wallet.pk,
+        len(signatures),
+        # get_new_signatures stops at the first page that is not full
+        pages=len(signatures) // settings.SIGNATURES_PAGE_SIZE + 1,
+    )
+    if not signatures:
+        wallet_stream.backfilled(wallet.address, started_at)
+        return wallet, [], []
+
+    results, fetched, complete = await get_wallet_transactions(
+        api,
+        wallet,
+        signatures,
+    )
+    # the cursor and the stream gap stay until every signature is fetched
+    if complete:
+        wallet.last_signature = signatures[0]
+        wallet_stream.backfilled(wallet.address, started_at)
+    return wallet, results, fetched
+
 
-    done, _ = await asyncio_wait(
+async def get_latest_history(
+    token_address: str,
+) -> tuple[CoinHistory, CoinInfo]:
+    try:
+        coin_price = await price_oracle.get_price(
+            'solana-mainnet',
+            token_address,
+        )
+        async with DexscreenerAPI() as dex_api:
+            coin_info = await dex_api.get_coin_info('solana', token_address)
+    except CoinNotFound:
+        coin_cache.set_not_found('solana', token_address)
+        raise
+
+    prices = CoinHistory(
+        token_address,
+        'solana-mainnet',
         [
-            asyncio.create_task(get_transaction(tx))
-            for tx in transactions
-            if tx not in already_sent_transactions
+            HistoricalPrice(
+                price=str(coin_price.price),
+                timestamp=str(time.time()),
+                market_cap=coin_info.market_cap,
+            ),
         ],
     )
-    return [i.result() for i in done]
+    return prices, coin_info
+
+
+async def save_transactions(transactions: list[Transaction]) -> None:
+    # signatures processed again after a failure are already stored
+    stored = {
+        i
+        async for i in Transaction.objects.filter(
+            signature__in=[i.signature for i in transactions],
+        ).values_list('wallet_id', 'signature')
+    }
+    await Transaction.objects.abulk_create(
+        [i for i in transactions if (i.wallet_id, i.signature) not in stored],
+    )
 
 
 async def filter_wallet_transactions(
-    api: AlchemyAPI,
     token_address: str,
     tx_list: list[TransactionData],
 ) -> list[tuple[TransactionData, Coin, CoinHistory]]:
-    prices = await api.get_historical_prices('solana-mainnet', token_address)
+    prices = await price_oracle.get_history('solana-mainnet', token_address)
 
+    coin_info = None
     if not prices:
-        async with DexscreenerAPI() as dex_api:
-            try:
-                coin_price = await api.get_coin_price(
-                    'solana-mainnet',
-                    token_address,
-                )
-                coin_info = await dex_api.get_coin_info(
-                    'solana',
-                    token_address,
-                )
-                prices = CoinHistory(
-                    token_address,
-                    'solana-mainnet',
-                    [
-                        HistoricalPrice(
-                            price=str(coin_price.price),
-                            timestamp=str(time.time()),
-                            market_cap=coin_info.market_cap,
-                        ),
-                    ],
-                )
-                logger.info(prices)
-            except CoinNotFound:
-                await Transaction.objects.abulk_create(
-                    [
-                        Transaction(
-                            wallet=await Wallet.objects.aget(
-                                address=tx.wallet_address,
-                            ),
-                            coin_amount=tx.token_amount,
-                            date=datetime.fromtimestamp(tx.timestamp, tz=UTC),
-                            signature=tx.signature,
-                        )
-                        for tx in tx_list
-                    ],
-                )
-                return []
+        try:
+            # tokens known to be missing skip the price and info requests,
+            # the negative entry is set by get_latest_history only, so it
+            # expires even when the token keeps being traded
+            coin_cache.get('solana', token_address)
+            prices, coin_info = await get_latest_history(token_address)
+            logger.info(prices)
+        except CoinNotFound:
+            await save_transactions(
+                [
+                    Transaction(
+                        wallet_id=tx.wallet_id,
+                        coin_amount=tx.token_amount,
+                        date=datetime.fromtimestamp(tx.timestamp, tz=UTC),
+                        signature=tx.signature,
+                    )
+                    for tx in tx_list
+                ],
+            )
+            return []
 
     try:
-        coin = await Coin.objects.aget_or_create(token_address, 'solana')
+        coin = await Coin.objects.aget_or_create(
+            token_address,
+            'solana',
+            coin_info,
+        )
     except CoinNotFound:
         return []
 
-    await Transaction.objects.abulk_create(
+    await save_transactions(
         [
             Transaction(
-                wallet=await Wallet.objects.aget(address=tx.wallet_address),
+                wallet_id=tx.wallet_id,
                 coin=coin,
                 coin_amount=tx.token_amount,
                 coin_price=prices.price,
@@ -267,132 +294,248 @@ async def send_wallet_transaction(
         f'Количество: {tx.token_amount}\n'
         f'Общая сумма: ${tx.token_amount * history.price}'
     )
-    wallet = await Wallet.objects.aget(address=tx.wallet_address)
     coin_age = (datetime.now(UTC) - coin.created_at).total_seconds() // 60
-    await asyncio_wait(
-        [
-            asyncio.create_task(safe_send_message(c.pk, text))
-            async for c in Client.objects.filter(
-                Q(max_coin_price__gte=history.price)
-                | Q(max_coin_price__isnull=True),
-                Q(min_coin_market_cap__lte=history.market_cap)
-                | Q(min_coin_market_cap__isnull=True),
-                Q(min_coin_age__lte=coin_age) | Q(min_coin_age__isnull=True),
-                Q(max_coin_age__gte=coin_age) | Q(max_coin_age__isnull=True),
-                wallets__wallet=wallet,
-                alerts_enabled=True,
-            )
-        ],
+    clients = subscriber_matrix.recipients(
+        tx.wallet_id,
+        price=history.price,
+        market_cap=history.market_cap,
+        age=coin_age,
+    )
+    await outbox.put(
+        [Notification(f'tx:{tx.signature}:{i}', i, text) for i in clients],
     )
     return tx.signature
 
 
 async def notify_wallets_transactions():
     logger.info('Starting notify_wallets_transactions...')
-    async with AlchemyAPI() as api:
-        done, _ = await asyncio_wait(
-            [
-                asyncio.create_task(get_wallet_new_transactions(api, w))
-                async for w in Wallet.objects.get_tracked()
-            ],
-        )
-        transactions = [
-            tx for i in done for tx in i.result() if tx is not None
-        ]
+    if not subscriber_matrix.loaded:
+        await subscriber_matrix.load()
+
+    tracked = await sync_to_async(
+        lambda: [
+            w
+            for w in Wallet.objects.get_tracked()
+            if sharding.owns(f'wallet:{w.pk}')
+        ],
+    )()
+    if wallet_stream.is_running:
+        await wallet_stream.set_addresses({w.address for w in tracked})
+
+    # streamed wallets are polled only to fill the gap before the stream
+    wallets = wallet_poller.get_due(
+        [w for w in tracked if w.address not in wallet_stream.subscribed],
+    )
+    # gaps are kept after a disconnect, so a due wallet may have one too
+    due = {w.pk for w in wallets}
+    wallets += [
+        w
+        for w in tracked
+        if w.address in wallet_stream.gaps and w.pk not in due
+    ]
+    logger.info(f'Polling {len(wallets)} of {len(tracked)} wallets')
+    if not wallets:
+        return
+
+    cursors = {w.pk: w.last_signature for w in wallets}
 
     async with AlchemyAPI() as api:
-        transactions = sorted(transactions, key=lambda t: t.token_address)
-        done, _ = await asyncio_wait(
-            [
-                asyncio.create_task(
-                    filter_wallet_transactions(api, address, list(tx_list)),
-                )
-                for address, tx_list in groupby(
-                    transactions,
-                    lambda t: t.token_address,
-                )
-            ],
+        results = await run_pool(
+            lambda w: get_wallet_new_transactions(api, w),
+            wallets,
+            workers=settings.NOTIFY_WALLETS_WORKERS,
         )
-        done = [j for i in done for j in i.result()]
+    await process_wallets_transactions(cursors, results)
+
+
+async def process_wallets_transactions(
+    cursors: dict[int, str],
+    results: list[tuple[Wallet, list[TransactionData], list[str]]],
+):
+    transactions = sorted(
+        [tx for _, i, _ in results for tx in i],
+        key=lambda t: t.token_address,
+    )
+
+    async def filter_transactions(address: str, tx_list: list):
+        return tx_list, await filter_wallet_transactions(address, tx_list)
+
+    filtered = await run_pool(
+        lambda i: filter_transactions(*i),
+        [
+            (address, list(tx_list))
+            for address, tx_list in groupby(
+                transactions,
+                lambda t: t.token_address,
+            )
+        ],
+        workers=settings.NOTIFY_TOKENS_WORKERS,
+    )
+    processed = {tx.signature for tx_list, _ in filtered for tx in tx_list}
+    done = [j for _, i in filtered for j in i]
 
     if done:
-        done, _ = await asyncio_wait(
-            [asyncio.create_task(send_wallet_transaction(*i)) for i in done],
+        sent = await run_pool(
+            lambda i: send_wallet_transaction(*i),
+            done,
+            workers=settings.NOTIFY_TOKENS_WORKERS,
         )
+        # sent means the notifications are stored in the outbox
         await Transaction.objects.filter(
-            signature__in=[i.result() for i in done],
+            signature__in=sent,
         ).aupdate(sent=True)
+        processed -= {tx.signature for tx, _, _ in done} - set(sent)
     else:
         logger.info('There are no new transactions')
 
+    # signatures are marked seen and cursors saved only after the
+    # notifications are in the outbox, so after a crash they are fetched
+    # again and the outbox skips the notifications that were put already
+    failed = {tx.signature for tx in transactions} - processed
+    for wallet, _, fetched in results:
+        if failed.intersection(fetched):
+            wallet.last_signature = cursors[wallet.pk]
+            if wallet.address in wallet_stream.subscribed:
+                wallet_stream.add_gap(wallet.address)
+        await seen_signatures.add(
+            wallet.pk,
+            [i for i in fetched if i not in failed],
+        )
 
-async def get_new_coins(api: BirdEyeAPI, f: ClientFilters):
-    results = filter_results(f, return_str=False)
+    await Wallet.objects.abulk_update(
+        [w for w, _, _ in results if w.last_signature != cursors[w.pk]],
+        ['last_signature'],
+    )
 
-    try:
-        new_results = await get_and_filter_results(
-            api,
-            f,
-            TokenListParams(
-                min_liquidity=int(f.min_liquidity),
-                offset=f.offset,
-            ),
+
+async def process_streamed_signatures(
+    api: AlchemyAPI,
+    signatures: dict[str, list[str]],
+):
+    wallets = [
+        w
+        async for w in Wallet.objects.filter(
+            address__in=list(signatures),
+            chain='solana-mainnet',
         )
-    except BirdEyeBadRequest:
-        # if offset is too large
-        logger.info(f'Set offset=0 to ClientFilters {f}')
-        await ClientFilters.objects.update_by_id(f.pk, offset=0)
-        return
+    ]
+    cursors = {w.pk: w.last_signature for w in wallets}
 
-    data = {'offset': f.offset + 50}
-    new_coins = [i for i in new_results if i not in results]
-    if new_coins:
-        text = '\n\n'.join(i.message_text for i in new_coins)
-        await safe_send_message(
-            f.client_id,
-            f'Новые монеты по фильтрам:\n\n{text}'[:4000],
+    async def get_transactions(wallet: Wallet):
+        return wallet, *await get_wallet_transactions(
+            api,
+            wallet,
+            signatures[wallet.address],
         )
-        data['results'] = [*f.results, *[asdict(i) for i in new_coins]]
 
-    await ClientFilters.objects.update_by_id(f.pk, **data)
+    results = await run_pool(
+        get_transactions,
+        wallets,
+        workers=settings.NOTIFY_WALLETS_WORKERS,
+    )
 
+    # until a wallet is backfilled the cursor marks where polling resumes
+    complete = set()
+    for wallet, _, _, ok in results:
+        if ok and wallet_stream.is_streamed(wallet.address):
+            wallet.last_signature = signatures[wallet.address][-1]
+        if ok:
+            complete.add(wallet.pk)
+    # wallets that failed are polled from their old cursor
+    for wallet in wallets:
+        if wallet.pk not in complete:
+            wallet_stream.add_gap(wallet.address)
+
+    await process_wallets_transactions(
+        cursors,
+        [(wallet, i, fetched) for wallet, i, fetched, _ in results],
+    )
 
-async def notify_search_filters():
-    async with BirdEyeAPI() as api:
-        await asyncio_wait(
-            [
-                asyncio.create_task(get_new_coins(api, i))
-                async for i in ClientFilters.objects.filter(
-                    client__alerts_enabled=True,
+
+async def consume_wallet_stream():
+    async with AlchemyAPI() as api:
+        while True:
+            signatures = await wallet_stream.get_batch(
+                settings.WALLET_STREAM_BATCH_WAIT,
+            )
+            logger.info(
+                f'Got {sum(len(i) for i in signatures.values())} streamed '
+                f'signatures of {len(signatures)} wallets',
+            )
+            try:
+                await process_streamed_signatures(api, signatures)
+            except Exception as e:
+                logger.exception(
+                    'Cannot process streamed signatures',
+                    exc_info=e,
                 )
-                .select_related('client')
-                .all()
+
+
+async def get_new_coins(f: ClientFilters, tokens: TokenColumns):
+    new_results = filter_results(f, tokens, return_str=False)
+    if not new_results:
+        return
+
+    unseen = set(
+        await seen_coins.filter_unseen(
+            f.pk,
+            [i.coin_id for i in new_results],
+        ),
+    )
+    new_coins = [i for i in new_results if i.coin_id in unseen]
+    if new_coins:
+        text = '\n\n'.join(i.message_text for i in new_coins)
+        coin_ids = ','.join(str(i.coin_id) for i in new_coins)
+        await outbox.put(
+            [
+                Notification(
+                    f'coins:{f.pk}:{get_hash(coin_ids)}',
+                    f.client_id,
+                    f'Новые монеты по фильтрам:\n\n{text}'[:4000],
+                    coalesce=False,
+                ),
             ],
         )
+        await seen_coins.add(f.pk, list(unseen))
+        await SearchResult.objects.add(
+            f.pk,
+            [asdict(i) for i in new_coins],
+        )
 
 
-async def run_loop_task(
-    func: Callable[[], Coroutine[Any, Any, None]],
-    *,
-    timeout: int = settings.NOTIFY_TIMEOUT,
-):
-    try:
-        await func()
-        await asyncio.sleep(timeout)
-    except Exception as e:
-        logger.exception(f'Error in {func.__name__}', exc_info=e)
-        await asyncio.sleep(timeout)
-    finally:
-        loop.create_task(run_loop_task(func, timeout=timeout))
+async def scan_token_universe():
+    # one worker scans for all of them, so the minimum is over all filters
+    aggregate = await ClientFilters.objects.filter(
+        client__alerts_enabled=True,
+    ).aaggregate(min_liquidity=Min('min_liquidity'))
+    if aggregate['min_liquidity'] is None:
+        return
 
+    async with BirdEyeAPI() as api:
+        await token_universe.scan(api, aggregate['min_liquidity'])
 
-async def notify_coins():
-    await run_loop_task(notify_coins_prices_changes)
 
+async def notify_search_filters():
+    filters = await sync_to_async(
+        lambda: [
+            f
+            for f in ClientFilters.objects.filter(client__alerts_enabled=True)
+            if sharding.owns(f'filters:{f.pk}')
+        ],
+    )()
 
-async def notify_wallets():
-    await run_loop_task(notify_wallets_transactions)
+    # the other workers use the snapshot saved by the scanning one
+    if sharding.owns('token_universe'):
+        await scan_token_universe()
+    elif filters:
+        await token_universe.load()
 
+    tokens = token_universe.columns
+    if not filters or not tokens:
+        return
 
-async def notify_filters():
-    await run_loop_task(notify_search_filters, timeout=60)
+    await run_pool(
+        lambda f: get_new_coins(f, tokens),
+        filters,
+        workers=settings.NOTIFY_FILTERS_WORKERS,
+    )
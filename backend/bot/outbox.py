@@ -0,0 +1,301 @@
+import asyncio
+import time
+from dataclasses import dataclass
+
+from redis.asyncio import Redis
+from redis.exceptions import ResponseError
+
+from bot.delivery import delivery
+from bot.loader import logger, redis
+from bot.settings import settings
+from bot.sharding import Sharding
+
+# adds the entry only when its idempotency key has not been seen yet
+ENQUEUE = """
+if redis.call('set', KEYS[1], 'pending', 'NX', 'EX', ARGV[1]) then
+    return redis.call('xadd', KEYS[2], '*', unpack(ARGV, 2))
+end
+return false
+"""
+
+
+@dataclass
+class Notification:
+    key: str
+    chat_id: int
+    text: str
+    coalesce: bool = True
+
+
+class Outbox:
+    """Durable notifications queue on Redis streams, partitioned by chat."""
+
+    def __init__(
+        self,
+        redis_client: Redis,
+        *,
+        stream: str = settings.OUTBOX_STREAM,
+        group: str = settings.OUTBOX_GROUP,
+        partitions: int = settings.OUTBOX_PARTITIONS,
+        key_ttl: int = settings.OUTBOX_KEY_TTL,
+        batch_size: int = settings.OUTBOX_BATCH_SIZE,
+        concurrency: int = settings.OUTBOX_CONCURRENCY,
+        claim_idle: float = settings.OUTBOX_CLAIM_IDLE,
+        max_attempts: int = settings.OUTBOX_MAX_ATTEMPTS,
+    ):
+        self.redis = redis_client
+        self.stream = stream
+        self.group = group
+        self.partitions = partitions
+        self.key_ttl = key_ttl
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.claim_idle = claim_idle
+        self.max_attempts = max_attempts
+        self.sharding = Sharding(
+            redis_client,
+            enabled=True,
+            shards=partitions,
+            prefix=f'{stream}:sharding',
+        )
+        self.consumer = self.sharding.worker_id
+        self._enqueue = redis_client.register_script(ENQUEUE)
+        self._streams: set[str] = set()
+        self._semaphore: asyncio.Semaphore | None = None
+        self._tasks: set[asyncio.Task] = set()
+        self._in_flight: set[tuple[str, bytes]] = set()
+        self._task: asyncio.Task | None = None
+
+    def _get_key(self, key: str) -> str:
+        return f'{self.stream}:key:{key}'
+
+    def get_stream(self, partition: int) -> str:
+        return f'{self.stream}:{partition}'
+
+    async def put(self, notifications: list[Notification]) -> int:
+        if not notifications:
+            return 0
+
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for i in notifications:
+                stream = self.get_stream(self.sharding.get_shard(i.chat_id))
+                await self._enqueue(
+                    keys=[self._get_key(i.key), stream],
+                    args=[
+                        self.key_ttl,
+                        'key',
+                        i.key,
+                        'chat_id',
+                        i.chat_id,
+                        'text',
+                        i.text,
+                        'coalesce',
+                        int(i.coalesce),
+                    ],
+                    client=pipe,
+                )
+            results = await pipe.execute()
+
+        added = sum(1 for i in results if i)
+        if added < len(notifications):
+            logger.info(
+                f'{len(notifications) - added} of {len(notifications)} '
+                f'notifications are already in the outbox',
+            )
+        return added
+
+    def start(self) -> None:
+        if self._task is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if not self._task:
+            return
+
+        # unacknowledged entries are replayed by the next partition owner
+        for task in [self._task, *self._tasks]:
+            task.cancel()
+        await asyncio.gather(self._task, *self._tasks, return_exceptions=True)
+        self._task = None
+        self._streams = set()
+        await self.sharding.stop()
+
+    async def _create_group(self, stream: str) -> None:
+        try:
+            await self.redis.xgroup_create(
+                stream,
+                self.group,
+                id='0',
+                mkstream=True,
+            )
+        except ResponseError as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+
+    async def _sync(self) -> None:
+        await self.sharding.sync()
+        delivery.set_rate(
+            settings.DELIVERY_RATE
+            * max(len(self.sharding.leased), 1)
+            / self.partitions,
+        )
+
+        streams = {self.get_stream(i) for i in self.sharding.leased}
+        for stream in sorted(streams - self._streams):
+            await self._create_group(stream)
+            if replayed := await self._replay(stream):
+                logger.info(f'Replaying {replayed} notifications of {stream}')
+        self._streams = streams
+
+    async def _claim(self, stream: str) -> int:
+        claimed = 0
+        start_id = '0-0'
+        while True:
+            start_id, entries, _ = await self.redis.xautoclaim(
+                stream,
+                self.group,
+                self.consumer,
+                int(self.claim_idle * 1000),
+                start_id,
+                count=self.batch_size,
+            )
+            claimed += len(entries)
+            await self._spawn(stream, entries)
+            if start_id in (b'0-0', '0-0'):
+                return claimed
+
+    async def _read(self) -> None:
+        if not self._streams:
+            await asyncio.sleep(1)
+            return
+
+        response = await self.redis.xreadgroup(
+            self.group,
+            self.consumer,
+            dict.fromkeys(self._streams, '>'),
+            count=self.batch_size,
+            block=1000,
+        )
+        for stream, entries in response:
+            await self._spawn(stream.decode(), entries)
+
+    async def _spawn(self, stream: str, entries: list) -> None:
+        for entry_id, fields in entries:
+            # a slow send may be claimed while it still waits in delivery
+            if (stream, entry_id) in self._in_flight:
+                continue
+            # entries deleted from the stream are claimed without fields
+            if not fields:
+                await self._ack(stream, entry_id)
+                continue
+
+            await self._semaphore.acquire()
+            self._in_flight.add((stream, entry_id))
+            task = asyncio.create_task(
+                self._deliver(stream, entry_id, fields),
+            )
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _ack(
+        self,
+        stream: str,
+        entry_id: bytes,
+        key: str | None = None,
+    ) -> None:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            if key:
+                pipe.set(self._get_key(key), 'sent', xx=True, keepttl=True)
+            pipe.xack(stream, self.group, entry_id)
+            pipe.xdel(stream, entry_id)
+            await pipe.execute()
+
+    async def _get_attempts(self, stream: str, entry_id: bytes) -> int:
+        pending = await self.redis.xpending_range(
+            stream,
+            self.group,
+            min=entry_id,
+            max=entry_id,
+            count=1,
+        )
+        return pending[0]['times_delivered'] if pending else 0
+
+    async def _deliver(self, stream: str, entry_id: bytes, fields: dict):
+        try:
+            key = fields[b'key'].decode()
+            chat_id = int(fields[b'chat_id'])
+            if await self.redis.get(self._get_key(key)) == b'sent':
+                await self._ack(stream, entry_id)
+                return
+
+            sent = await delivery.send(
+                chat_id,
+                fields[b'text'].decode(),
+                coalesce=fields[b'coalesce'] == b'1',
+            )
+            if sent:
+                await self._ack(stream, entry_id, key)
+            elif (
+                await self._get_attempts(stream, entry_id) >= self.max_attempts
+            ):
+                logger.warning(
+                    f'Notification {key} to user (id={chat_id}) was dropped '
+                    f'after {self.max_attempts} attempts',
+                )
+                await self._ack(stream, entry_id)
+        except Exception as e:
+            logger.exception(f'Cannot deliver {entry_id}', exc_info=e)
+        finally:
+            self._in_flight.discard((stream, entry_id))
+            self._semaphore.release()
+
+    async def _replay(self, stream: str) -> int:
+        # entries read by this consumer before a restart, entries of the
+        # other consumers are taken over by _claim
+        replayed = 0
+        last_id = '0'
+        while True:
+            response = await self.redis.xreadgroup(
+                self.group,
+                self.consumer,
+                {stream: last_id},
+                count=self.batch_size,
+            )
+            entries = response[0][1] if response else []
+            if not entries:
+                return replayed
+
+            replayed += len(entries)
+            await self._spawn(stream, entries)
+            last_id = entries[-1][0]
+
+    async def _run(self) -> None:
+        synced_at = 0.0
+        claimed_at = 0.0
+        while True:
+            try:
+                if (
+                    time.monotonic() - synced_at
+                    >= settings.SHARDING_SYNC_INTERVAL
+                ):
+                    await self._sync()
+                    synced_at = time.monotonic()
+
+                if time.monotonic() - claimed_at >= self.claim_idle / 2:
+                    claimed = 0
+                    for stream in sorted(self._streams):
+                        claimed += await self._claim(stream)
+                    if claimed:
+                        logger.info(f'Claimed {claimed} notifications')
+                    claimed_at = time.monotonic()
+                await self._read()
+            except Exception as e:
+                logger.exception('Error in outbox', exc_info=e)
+                # groups are created again after the next sync
+                self._streams = set()
+                synced_at = 0.0
+                await asyncio.sleep(1)
+
+
+outbox = Outbox(redis)
@@ -0,0 +1,69 @@
+import asyncio
+from collections.abc import AsyncIterable, Awaitable, Callable, Iterable
+from typing import Any
+
+from bot.loader import logger
+
+_stop = object()
+
+
+class WorkerPool:
+    """A fixed number of workers reading items from a bounded queue."""
+
+    def __init__(
+        self,
+        func: Callable[[Any], Awaitable[Any]],
+        *,
+        workers: int,
+        queue_size: int | None = None,
+        name: str | None = None,
+    ):
+        self.func = func
+        self.workers = workers
+        self.queue_size = queue_size or workers * 2
+        self.name = name or getattr(func, '__name__', 'pool')
+        self.processed = 0
+        self.failed = 0
+
+    async def _worker(self, queue: asyncio.Queue, results: list) -> None:
+        while (item := await queue.get()) is not _stop:
+            try:
+                results.append(await self.func(item))
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                logger.exception(f'Error in {self.name}', exc_info=e)
+
+    async def map(self, items: Iterable | AsyncIterable) -> list:
+        queue = asyncio.Queue(self.queue_size)
+        results = []
+        workers = [
+            asyncio.create_task(self._worker(queue, results))
+            for _ in range(self.workers)
+        ]
+        try:
+            if isinstance(items, AsyncIterable):
+                async for item in items:
+                    await queue.put(item)
+            else:
+                for item in items:
+                    await queue.put(item)
+
+            for _ in workers:
+                await queue.put(_stop)
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+        return results
+
+
+async def run_pool(
+    func: Callable[[Any], Awaitable[Any]],
+    items: Iterable | AsyncIterable,
+    *,
+    workers: int,
+    queue_size: int | None = None,
+) -> list:
+    pool = WorkerPool(func, workers=workers, queue_size=queue_size)
+    return await pool.map(items)
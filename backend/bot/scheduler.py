@@ -0,0 +1,188 @@
+import asyncio
+import random
+import time
+from collections.abc import Callable, Coroutine
+from dataclasses import dataclass
+from enum import StrEnum
+from typing import Any
+
+from bot.loader import logger
+from bot.settings import settings
+
+
+class OverrunPolicy(StrEnum):
+    # drop the ticks that were missed and wait for the next one
+    SKIP = 'skip'
+    # run the missed ticks back to back, up to max_backlog of them
+    CATCH_UP = 'catch_up'
+
+
+@dataclass
+class LoopStats:
+    runs: int = 0
+    errors: int = 0
+    overruns: int = 0
+    skipped: int = 0
+    last_period: float = 0
+    last_runtime: float = 0
+    last_lag: float = 0
+    max_runtime: float = 0
+    max_lag: float = 0
+    runtime_total: float = 0
+
+    @property
+    def runtime_avg(self) -> float:
+        if not self.runs:
+            return 0
+        return self.runtime_total / self.runs
+
+
+class PeriodicTask:
+    def __init__(
+        self,
+        func: Callable[[], Coroutine[Any, Any, None]],
+        period: float,
+        *,
+        name: str | None = None,
+        jitter: float = settings.SCHEDULER_JITTER,
+        policy: OverrunPolicy = OverrunPolicy.SKIP,
+        max_backlog: int = settings.SCHEDULER_MAX_BACKLOG,
+        offset: float = 0,
+    ):
+        self.func = func
+        self.period = period
+        self.name = name or func.__name__
+        self.jitter = jitter
+        self.policy = policy
+        self.max_backlog = max_backlog
+        self.offset = offset
+        self.stats = LoopStats()
+        self._next_run = 0.0
+        self._tick_at: float | None = None
+        self._started_at: float | None = None
+        self._wakeup = asyncio.Event()
+
+    def set_period(self, period: float) -> None:
+        if period == self.period:
+            return
+
+        logger.info(f'{self.name} period changed {self.period}s -> {period}s')
+        self.period = period
+        if self._tick_at is not None:
+            self._next_run = self._tick_at + period
+        self._wakeup.set()
+
+    async def _sleep(self) -> None:
+        jitter = random.uniform(0, self.jitter) if self.jitter else 0
+        # _next_run may be moved by set_period while sleeping
+        while (delay := self._next_run + jitter - time.monotonic()) > 0:
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except TimeoutError:
+                return
+
+    def _schedule_next(self, now: float) -> None:
+        # ticks are counted from the schedule, not from the end of the run,
+        # so the runtime does not shift the following ticks
+        self._next_run = self._tick_at + self.period
+        if now <= self._next_run:
+            return
+
+        self.stats.overruns += 1
+        missed = int((now - self._next_run) // self.period) + 1
+        catch_up = self.policy == OverrunPolicy.CATCH_UP
+        if catch_up and missed <= self.max_backlog:
+            return
+
+        self.stats.skipped += missed
+        self._next_run += missed * self.period
+        logger.warning(
+            f'{self.name} overran its period of {self.period}s, '
+            f'{missed} tick(s) skipped',
+        )
+
+    async def run(self) -> None:
+        self._next_run = time.monotonic() + self.offset
+        while True:
+            await self._sleep()
+
+            self._tick_at = self._next_run
+            started_at = time.monotonic()
+            if self._started_at is not None:
+                self.stats.last_period = started_at - self._started_at
+            self._started_at = started_at
+            self.stats.last_lag = max(started_at - self._tick_at, 0)
+            self.stats.max_lag = max(self.stats.max_lag, self.stats.last_lag)
+
+            try:
+                await self.func()
+            except Exception as e:
+                self.stats.errors += 1
+                logger.exception(f'Error in {self.name}', exc_info=e)
+
+            finished_at = time.monotonic()
+            runtime = finished_at - started_at
+            self.stats.runs += 1
+            self.stats.last_runtime = runtime
+            self.stats.runtime_total += runtime
+            self.stats.max_runtime = max(self.stats.max_runtime, runtime)
+            self._schedule_next(finished_at)
+
+
+class Scheduler:
+    def __init__(self):
+        self.tasks: dict[str, PeriodicTask] = {}
+        self._running: list[asyncio.Task] = []
+
+    def add(
+        self,
+        func: Callable[[], Coroutine[Any, Any, None]],
+        period: float,
+        **kwargs,
+    ) -> PeriodicTask:
+        task = PeriodicTask(func, period, **kwargs)
+        self.tasks[task.name] = task
+        return task
+
+    def set_period(self, name: str, period: float) -> None:
+        self.tasks[name].set_period(period)
+
+    def start(self) -> None:
+        if self._running:
+            return
+
+        self._running = [
+            asyncio.create_task(task.run(), name=name)
+            for name, task in self.tasks.items()
+        ]
+        self._running.append(asyncio.create_task(self._report_stats()))
+
+    async def stop(self) -> None:
+        for task in self._running:
+            task.cancel()
+        await asyncio.gather(*self._running, return_exceptions=True)
+        self._running = []
+        self.log_stats()
+
+    def log_stats(self) -> None:
+        for name, task in self.tasks.items():
+            stats = task.stats
+            logger.info(
+                f'{name} stats: period={task.period}s, runs={stats.runs}, '
+                f'errors={stats.errors}, overruns={stats.overruns}, '
+                f'skipped={stats.skipped}, '
+                f'last_period={stats.last_period:.2f}s, '
+                f'runtime_avg={stats.runtime_avg:.2f}s, '
+                f'runtime_max={stats.max_runtime:.2f}s, '
+                f'lag_last={stats.last_lag:.2f}s, '
+                f'lag_max={stats.max_lag:.2f}s',
+            )
+
+    async def _report_stats(self) -> None:
+        while True:
+            await asyncio.sleep(settings.SCHEDULER_STATS_INTERVAL)
+            self.log_stats()
+
+
+scheduler = Scheduler()
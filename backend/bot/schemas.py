@@ -90,6 +90,7 @@ class TransactionData:
     token_amount: float
     timestamp: int
     signature: str
+    wallet_id: int | None = None
 
 
 @dataclass
@@ -108,6 +109,7 @@ class TokenInfo(BaseCoinInfo):
 
     liquidity: float
     age: int | None = None
+    coin_id: int | None = None
 
     def __post_init__(self):
         if self.age:
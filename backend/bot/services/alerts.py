@@ -0,0 +1,173 @@
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from dataclasses import dataclass, field
+from math import inf
+
+from core.models import ClientCoin, CoinTrackingParams
+
+
+@dataclass
+class CoinAlerts:
+    coin_id: int
+    symbol: str
+    # (trigger_price, client_id) pairs sorted by trigger price
+    up: list[tuple[float, int]] = field(default_factory=list)
+    down: list[tuple[float, int]] = field(default_factory=list)
+    triggers: dict[int, tuple[str, float]] = field(default_factory=dict)
+    # how many times each client has armed the alert, see ClientCoin
+    epochs: dict[int, int] = field(default_factory=dict)
+
+    def __len__(self):
+        return len(self.triggers)
+
+    def add(
+        self,
+        client_id: int,
+        tracking_param: str,
+        trigger_price: float,
+        arm_epoch: int = 0,
+    ):
+        self.remove(client_id)
+        if tracking_param == CoinTrackingParams.PRICE_UP:
+            insort(self.up, (trigger_price, client_id))
+        else:
+            insort(self.down, (trigger_price, client_id))
+        self.triggers[client_id] = (tracking_param, trigger_price)
+        self.epochs[client_id] = arm_epoch
+
+    def remove(self, client_id: int) -> None:
+        if client_id not in self.triggers:
+            return
+
+        tracking_param, trigger_price = self.triggers.pop(client_id)
+        self.epochs.pop(client_id, None)
+        triggers = (
+            self.up
+            if tracking_param == CoinTrackingParams.PRICE_UP
+            else self.down
+        )
+        i = bisect_left(triggers, (trigger_price, client_id))
+        if i < len(triggers) and triggers[i] == (trigger_price, client_id):
+            del triggers[i]
+
+    def get_triggered(self, price: float) -> list[tuple[int, int]]:
+        up_end = bisect_right(self.up, (price, inf))
+        down_start = bisect_left(self.down, (price, -inf))
+        clients = [
+            *(i for _, i in self.up[:up_end]),
+            *(i for _, i in self.down[down_start:]),
+        ]
+        return [(i, self.epochs[i]) for i in clients]
+
+
+def get_trigger_price(client_coin: ClientCoin) -> float:
+    if client_coin.tracking_param == CoinTrackingParams.PRICE_UP:
+        return client_coin.start_price * (1 + client_coin.percentage / 100)
+    return client_coin.start_price * (1 - client_coin.percentage / 100)
+
+
+class AlertIndex:
+    def __init__(self):
+        self._coins: dict[tuple[str, str], CoinAlerts] = {}
+        self._coin_keys: dict[int, tuple[str, str]] = {}
+        self._client_coins: dict[int, set[int]] = defaultdict(set)
+        self.loaded = False
+
+    def __len__(self):
+        return sum(len(i) for i in self._coins.values())
+
+    @staticmethod
+    def get_armed():
+        return ClientCoin.objects.filter(
+            tracking_param__in=CoinTrackingParams.values,
+            start_price__gt=0,
+            percentage__isnull=False,
+            notification_sent=False,
+            client__alerts_enabled=True,
+        ).select_related('coin')
+
+    def _add(self, client_coin: ClientCoin) -> None:
+        coin = client_coin.coin
+        key = (coin.address, coin.chain)
+        if key not in self._coins:
+            self._coins[key] = CoinAlerts(coin.pk, coin.symbol)
+            self._coin_keys[coin.pk] = key
+
+        self._coins[key].add(
+            client_coin.client_id,
+            client_coin.tracking_param,
+            get_trigger_price(client_coin),
+            client_coin.arm_epoch,
+        )
+        self._client_coins[client_coin.client_id].add(coin.pk)
+
+    def _remove(self, client_id: int, coin_id: int) -> None:
+        self._client_coins[client_id].discard(coin_id)
+        key = self._coin_keys.get(coin_id)
+        if not key:
+            return
+
+        alerts = self._coins[key]
+        alerts.remove(client_id)
+        if not alerts:
+            del self._coins[key]
+            del self._coin_keys[coin_id]
+
+    async def load(self) -> None:
+        self._coins.clear()
+        self._coin_keys.clear()
+        self._client_coins.clear()
+        async for client_coin in self.get_armed():
+            self._add(client_coin)
+        self.loaded = True
+
+    async def refresh(self, client_id: int, coin_id: int | None = None):
+        if not self.loaded:
+            return
+
+        coins = self.get_armed().filter(client_id=client_id)
+        if coin_id:
+            coins = coins.filter(coin_id=coin_id)
+            coin_ids = [coin_id]
+        else:
+            coin_ids = list(self._client_coins[client_id])
+
+        for i in coin_ids:
+            self._remove(client_id, i)
+
+        async for client_coin in coins:
+            self._add(client_coin)
+
+    def coins(self) -> list[tuple[str, str]]:
+        return list(self._coins)
+
+    def get_triggered(
+        self,
+        address: str,
+        chain: str,
+        price: float,
+    ) -> tuple[CoinAlerts | None, list[tuple[int, int]]]:
+        alerts = self._coins.get((address, chain))
+        if not alerts:
+            return None, []
+        return alerts, alerts.get_triggered(price)
+
+    def remove_triggered(
+        self,
+        alerts: CoinAlerts,
+        clients: list[tuple[int, int]],
+    ) -> None:
+        for client_id, arm_epoch in clients:
+            # the alert may have been armed again since it was triggered
+            if alerts.epochs.get(client_id) != arm_epoch:
+                continue
+            alerts.remove(client_id)
+            self._client_coins[client_id].discard(alerts.coin_id)
+
+        key = self._coin_keys.get(alerts.coin_id)
+        if not alerts and self._coins.get(key) is alerts:
+            del self._coins[key]
+            del self._coin_keys[alerts.coin_id]
+
+
+alert_index = AlertIndex()
@@ -1,37 +1,69 @@
+from collections.abc import Callable
 from dataclasses import asdict
 
+import numpy as np
+
 from bot.api.birdeye import BirdEyeAPI
 from bot.schemas import TokenInfo, TokenListParams
 from bot.services.coin import bulk_get_or_create_coins
 from core.models import ClientFilters
 
 
+class TokenColumns:
+    def __init__(self, rows: list[dict] | list[TokenInfo]):
+        self.rows = rows
+        get = getattr if rows and isinstance(rows[0], TokenInfo) else dict.get
+
+        self.price = self._column(rows, get, 'price')
+        self.age = self._column(rows, get, 'age')
+        self.market_cap = self._column(rows, get, 'market_cap')
+        self.liquidity = self._column(rows, get, 'liquidity')
+
+    def __len__(self):
+        return len(self.rows)
+
+    @staticmethod
+    def _column(rows: list, get: Callable, name: str) -> np.ndarray:
+        return np.array([get(row, name) for row in rows], dtype=np.float64)
+
+    def mask(self, f: ClientFilters) -> np.ndarray:
+        # NaN never passes a comparison, so rows with missing data are skipped
+        mask = (self.market_cap >= f.min_market_cap) & (
+            self.liquidity >= f.min_liquidity
+        )
+        if f.min_price is not None:
+            mask &= self.price >= f.min_price
+        if f.max_price is not None:
+            mask &= self.price <= f.max_price
+        if f.min_age:
+            mask &= self.age >= f.min_age
+        if f.max_age is not None:
+            mask &= self.age <= f.max_age
+        return mask
+
+    def select(self, mask: np.ndarray) -> list[TokenInfo]:
+        return [
+            row if isinstance(row, TokenInfo) else TokenInfo(**row)
+            for row in (self.rows[i] for i in np.flatnonzero(mask))
+        ]
+
+
 def filter_results(
     f: ClientFilters,
+    results: list[dict] | list[TokenInfo] | TokenColumns,
     *,
-    results: list[dict] | list[TokenInfo] | None = None,
     return_str: bool = True,
 ) -> list[TokenInfo] | list[str]:
-    if not results:
-        results = f.results
-
     if not results:
         return []
 
-    if isinstance(results[0], TokenInfo):
-        results = [asdict(i) for i in results]
+    if not isinstance(results, TokenColumns):
+        results = TokenColumns(results)
 
-    return [
-        TokenInfo(**i).message_text if return_str else TokenInfo(**i)
-        for i in results
-        if (
-            (f.min_price is None or i['price'] >= f.min_price)
-            and (f.max_price is None or i['price'] <= f.max_price)
-            and (f.min_age == 0 or i.get('age', 0) >= f.min_age)
-            and (f.max_age is None or i.get('age', 0) <= f.max_age)
-            and i['market_cap'] >= f.min_market_cap
-        )
-    ]
+    tokens = results.select(results.mask(f))
+    if return_str:
+        return [i.message_text for i in tokens]
+    return tokens
 
 
 async def add_date_to_coins(results: list[dict]) -> list[dict]:
@@ -40,25 +72,21 @@ async def add_date_to_coins(results: list[dict]) -> list[dict]:
         [i['address'] for i in results],
     )
     results = [
-        {**i, 'age': coins[i['address']].age}
+        {
+            **i,
+            'age': coins[i['address']].age,
+            'coin_id': coins[i['address']].pk,
+        }
         for i in results
         if i['address'] in coins
     ]
     return results
 
 
-async def get_and_filter_results(
-    api: BirdEyeAPI,
-    f: ClientFilters,
-    params: TokenListParams,
-):
-    return filter_results(
-        f,
-        results=await add_date_to_coins(
-            [
-                asdict(i)
-                for i in await api.get_token_list(params, raise_if_empty=True)
-            ],
-        ),
-        return_str=False,
+async def get_results(api: BirdEyeAPI, params: TokenListParams) -> list[dict]:
+    return await add_date_to_coins(
+        [
+            asdict(i)
+            for i in await api.get_token_list(params, raise_if_empty=True)
+        ],
     )
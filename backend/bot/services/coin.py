@@ -2,7 +2,9 @@ import asyncio
 
 from asgiref.sync import sync_to_async
 
+from bot.api.alchemy import alchemy_chains
 from bot.api.dexscreener import DexscreenerAPI
+from bot.cache import coin_cache
 from bot.text_utils import chunk_list
 from core.models import Coin
 
@@ -20,17 +22,33 @@ async def bulk_get_or_create_coins(
         )
         return {k: v for i in done for k, v in i.result().items()}
 
+    coins, missing = coin_cache.get_many(chain, addresses)
+    if not missing:
+        return coins
+
     existed_coins = await sync_to_async(
-        lambda: list(Coin.objects.filter(chain=chain, address__in=addresses)),
+        lambda: list(
+            Coin.objects.filter(
+                chain=alchemy_chains[chain],
+                address__in=missing,
+            ),
+        ),
     )()
+    for coin in existed_coins:
+        coin_cache.set(coin)
+        coins[coin.address] = coin
+
+    new_addresses = [i for i in missing if i not in coins]
+    if not new_addresses:
+        return coins
 
     async with DexscreenerAPI() as api:
-        coins_info = await api.get_coins_info(chain, addresses)
+        coins_info = await api.get_coins_info(chain, new_addresses)
 
-    new_coins = [
-        await Coin.objects.aget_or_create(info.address, chain, info)
-        for info in coins_info
-    ]
+    for coin in await Coin.objects.abulk_upsert(chain, coins_info):
+        coins[coin.address] = coin
 
-    coins = [*existed_coins, *new_coins]
-    return {i.address: i for i in coins}
+    for address in new_addresses:
+        if address not in coins:
+            coin_cache.set_not_found(chain, address)
+    return coins
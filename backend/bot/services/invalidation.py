@@ -0,0 +1,100 @@
+import asyncio
+import json
+import os
+import socket
+
+from redis.asyncio import Redis
+
+from bot.loader import logger, redis
+from bot.services.alerts import alert_index
+from bot.services.subscribers import subscriber_matrix
+from bot.settings import settings
+
+
+class IndexInvalidation:
+    """Refreshes the in-memory indexes of every process."""
+
+    def __init__(
+        self,
+        redis_client: Redis,
+        *,
+        channel: str = 'index_invalidation',
+        reconnect_delay: float = settings.INVALIDATION_RECONNECT_DELAY,
+    ):
+        self.redis = redis_client
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+        self.process_id = f'{socket.gethostname()}:{os.getpid()}'
+        self._task: asyncio.Task | None = None
+
+    async def _publish(self, index: str, **kwargs) -> None:
+        message = {'sender': self.process_id, 'index': index, **kwargs}
+        try:
+            await self.redis.publish(self.channel, json.dumps(message))
+        except Exception as e:
+            logger.warning(f'Cannot publish {index} invalidation: {e!r}')
+
+    async def refresh_alerts(
+        self,
+        client_id: int,
+        coin_id: int | None = None,
+    ) -> None:
+        await alert_index.refresh(client_id, coin_id)
+        await self._publish('alerts', client_id=client_id, coin_id=coin_id)
+
+    async def refresh_subscribers(self, client_id: int) -> None:
+        await subscriber_matrix.refresh(client_id)
+        await self._publish('subscribers', client_id=client_id)
+
+    async def _handle(self, message: dict) -> None:
+        if message['sender'] == self.process_id:
+            return
+
+        if message['index'] == 'alerts':
+            await alert_index.refresh(message['client_id'], message['coin_id'])
+        elif message['index'] == 'subscribers':
+            await subscriber_matrix.refresh(message['client_id'])
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if not self._task:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    # refreshes published while unsubscribed are lost
+                    if alert_index.loaded:
+                        await alert_index.load()
+                    if subscriber_matrix.loaded:
+                        await subscriber_matrix.load()
+
+                    async for msg in pubsub.listen():
+                        if msg['type'] != 'message':
+                            continue
+                        try:
+                            await self._handle(json.loads(msg['data']))
+                        except Exception as e:
+                            logger.exception(
+                                'Error in index invalidation',
+                                exc_info=e,
+                            )
+            except Exception as e:
+                logger.info(f'Index invalidation error: {e!r}')
+
+            logger.info(
+                f'Index invalidation closed, '
+                f'resubscribing in {self.reconnect_delay}s',
+            )
+            await asyncio.sleep(self.reconnect_delay)
+
+
+invalidation = IndexInvalidation(redis)
@@ -0,0 +1,156 @@
+import asyncio
+from collections.abc import AsyncIterator
+
+from bot.api.alchemy import AlchemyAPI
+from bot.cache import TTLCache
+from bot.exceptions import CoinNotFound
+from bot.loader import logger
+from bot.schemas import CoinHistory, CoinInputData, CoinPrice
+from bot.settings import settings
+from bot.text_utils import chunk_list
+
+_missing = object()
+
+
+class PriceOracle:
+    def __init__(
+        self,
+        *,
+        ttl: float = settings.PRICES_CACHE_TTL,
+        max_wait: float = settings.PRICES_BATCH_WAIT,
+        chunk_size: int = settings.PRICES_CHUNK_SIZE,
+        max_in_flight: int = settings.PRICES_MAX_IN_FLIGHT,
+    ):
+        self.max_wait = max_wait
+        self.chunk_size = chunk_size
+        self.max_in_flight = max_in_flight
+        self._prices = TTLCache(ttl)
+        self._history = TTLCache(ttl)
+        self._inflight: dict[tuple[str, str], asyncio.Future] = {}
+        self._inflight_history: dict[tuple[str, str], asyncio.Future] = {}
+        self._queue: list[tuple[str, str]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._semaphore: asyncio.Semaphore | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    async def get_prices(self, coins: list[CoinInputData]) -> list[CoinPrice]:
+        prices, futures = [], []
+        for coin in coins:
+            key = (coin.network, coin.address)
+            price = self._prices.get(key, _missing)
+            if price is not _missing:
+                prices.append(price)
+            elif key in self._inflight:
+                futures.append(self._inflight[key])
+            else:
+                future = asyncio.get_running_loop().create_future()
+                self._inflight[key] = future
+                self._queue.append(key)
+                futures.append(future)
+
+        if len(self._queue) >= self.chunk_size:
+            self._flush()
+        elif self._queue and not self._timer:
+            self._timer = asyncio.get_running_loop().call_later(
+                self.max_wait,
+                self._flush,
+            )
+
+        if futures:
+            prices.extend(
+                await asyncio.gather(*[asyncio.shield(i) for i in futures]),
+            )
+        return [i for i in prices if i is not None]
+
+    async def get_price(self, chain: str, address: str) -> CoinPrice:
+        prices = await self.get_prices([CoinInputData(chain, address)])
+        if not prices:
+            raise CoinNotFound(address=address)
+        return prices[0]
+
+    async def iter_prices(
+        self,
+        coins: list[CoinInputData],
+    ) -> AsyncIterator[list[CoinPrice]]:
+        self._prices.clear_expired()
+        self._history.clear_expired()
+        for prices in asyncio.as_completed(
+            [
+                self.get_prices(chunk)
+                for chunk in chunk_list(coins, self.chunk_size)
+            ],
+        ):
+            yield await prices
+
+    async def get_history(
+        self,
+        chain: str,
+        address: str,
+    ) -> CoinHistory | None:
+        key = (chain, address)
+        history = self._history.get(key, _missing)
+        if history is not _missing:
+            return history
+
+        if key not in self._inflight_history:
+            self._inflight_history[key] = asyncio.ensure_future(
+                self._fetch_history(chain, address),
+            )
+        return await asyncio.shield(self._inflight_history[key])
+
+    def _flush(self) -> None:
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+
+        if not self._semaphore:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+
+        queue, self._queue = self._queue, []
+        for chunk in chunk_list(queue, self.chunk_size):
+            task = asyncio.create_task(self._fetch_prices(chunk))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _fetch_prices(self, keys: list[tuple[str, str]]) -> None:
+        prices = {}
+        try:
+            async with self._semaphore, AlchemyAPI() as api:
+                for i in await api.get_coins_prices(
+                    [CoinInputData(*key) for key in keys],
+                ):
+                    prices[(i.chain, i.address.lower())] = i
+        except Exception as e:
+            logger.exception(
+                f'Cannot get prices for {len(keys)} coins',
+                exc_info=e,
+            )
+            for key in keys:
+                self._resolve(key, None)
+            return
+
+        for chain, address in keys:
+            price = prices.get((chain, address.lower()))
+            self._prices.set((chain, address), price)
+            self._resolve((chain, address), price)
+
+    def _resolve(self, key: tuple[str, str], price: CoinPrice | None):
+        future = self._inflight.pop(key)
+        if not future.done():
+            future.set_result(price)
+
+    async def _fetch_history(
+        self,
+        chain: str,
+        address: str,
+    ) -> CoinHistory | None:
+        try:
+            async with AlchemyAPI() as api:
+                history = await api.get_historical_prices(chain, address)
+            self._history.set((chain, address), history)
+            return history
+        finally:
+            del self._inflight_history[(chain, address)]
+
+
+price_oracle = PriceOracle()
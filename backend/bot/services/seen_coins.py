@@ -0,0 +1,71 @@
+from redis.asyncio import Redis
+
+from bot.loader import redis
+from core.models import SearchResult
+
+# bit 0 is never a coin id, it marks that the bitmap was seeded
+_SEEDED_BIT = 0
+
+
+class SeenCoins:
+    """Coins ever shown to a client, one bit per Coin id."""
+
+    def __init__(self, redis_client: Redis, *, prefix: str = 'seen_coins'):
+        self.redis = redis_client
+        self.prefix = prefix
+
+    def _get_key(self, client_id: int | str) -> str:
+        return f'{self.prefix}:{client_id}'
+
+    async def _seed(self, client_id: int | str) -> None:
+        coin_ids = [
+            i
+            async for i in SearchResult.objects.filter(
+                filters_id=client_id,
+            ).values_list('coin_id', flat=True)
+        ]
+        await self._set_bits(client_id, [_SEEDED_BIT, *coin_ids])
+
+    async def _set_bits(self, client_id: int | str, bits: list[int]):
+        key = self._get_key(client_id)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for i in bits:
+                pipe.setbit(key, i, 1)
+            await pipe.execute()
+
+    async def add(self, client_id: int | str, coin_ids: list[int]) -> None:
+        if coin_ids:
+            await self._set_bits(client_id, coin_ids)
+
+    async def filter_unseen(
+        self,
+        client_id: int | str,
+        coin_ids: list[int],
+    ) -> list[int]:
+        if not coin_ids:
+            return []
+
+        key = self._get_key(client_id)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for i in [_SEEDED_BIT, *coin_ids]:
+                pipe.getbit(key, i)
+            seeded, *bits = await pipe.execute()
+
+        if not seeded:
+            await self._seed(client_id)
+            return await self.filter_unseen(client_id, coin_ids)
+
+        return [
+            coin_id
+            for coin_id, bit in zip(coin_ids, bits, strict=True)
+            if not bit
+        ]
+
+    async def count(self, client_id: int | str) -> int:
+        key = self._get_key(client_id)
+        if not await self.redis.getbit(key, _SEEDED_BIT):
+            await self._seed(client_id)
+        return await self.redis.bitcount(key) - 1
+
+
+seen_coins = SeenCoins(redis)
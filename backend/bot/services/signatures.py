@@ -0,0 +1,61 @@
+import time
+
+from redis.asyncio import Redis
+
+from bot.loader import redis
+from bot.settings import settings
+
+
+class SeenSignatures:
+    def __init__(
+        self,
+        redis_client: Redis,
+        *,
+        prefix: str = 'seen_signatures',
+        bucket_size: int = settings.SEEN_SIGNATURES_BUCKET_SIZE,
+        buckets: int = settings.SEEN_SIGNATURES_BUCKETS,
+    ):
+        self.redis = redis_client
+        self.prefix = prefix
+        self.bucket_size = bucket_size
+        self.buckets = buckets
+
+    def _get_keys(self) -> list[str]:
+        current = int(time.time() // self.bucket_size)
+        return [
+            f'{self.prefix}:{i}'
+            for i in range(current, current - self.buckets, -1)
+        ]
+
+    async def add(self, wallet_id: int, signatures: list[str]) -> None:
+        if not signatures:
+            return
+
+        key = self._get_keys()[0]
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.sadd(key, *[f'{wallet_id}:{i}' for i in signatures])
+            pipe.expire(key, self.bucket_size * self.buckets)
+            await pipe.execute()
+
+    async def filter_unseen(
+        self,
+        wallet_id: int,
+        signatures: list[str],
+    ) -> list[str]:
+        if not signatures:
+            return []
+
+        members = [f'{wallet_id}:{i}' for i in signatures]
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for key in self._get_keys():
+                pipe.smismember(key, members)
+            buckets = await pipe.execute()
+
+        return [
+            signature
+            for i, signature in enumerate(signatures)
+            if not any(bucket[i] for bucket in buckets)
+        ]
+
+
+seen_signatures = SeenSignatures(redis)
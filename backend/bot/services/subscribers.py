@@ -0,0 +1,129 @@
+from collections import defaultdict
+from dataclasses import dataclass
+from math import inf
+
+import numpy as np
+
+from core.models import ClientWallet
+
+CoinFilters = tuple[float, float, float, float]
+
+
+@dataclass
+class WalletSubscribers:
+    client_ids: np.ndarray
+    max_coin_price: np.ndarray
+    min_coin_market_cap: np.ndarray
+    min_coin_age: np.ndarray
+    max_coin_age: np.ndarray
+
+    @classmethod
+    def build(cls, clients: dict[int, CoinFilters]) -> 'WalletSubscribers':
+        filters = np.array(list(clients.values()), dtype=np.float64)
+        return cls(
+            np.fromiter(clients, dtype=np.int64, count=len(clients)),
+            *filters.reshape(-1, 4).T,
+        )
+
+    def recipients(
+        self,
+        price: float,
+        market_cap: float,
+        age: float,
+    ) -> list[int]:
+        mask = (
+            (self.max_coin_price >= price)
+            & (self.min_coin_market_cap <= market_cap)
+            & (self.min_coin_age <= age)
+            & (self.max_coin_age >= age)
+        )
+        return self.client_ids[mask].tolist()
+
+
+def _get_filters(
+    max_coin_price: float | None,
+    min_coin_market_cap: float | None,
+    min_coin_age: float | None,
+    max_coin_age: float | None,
+) -> CoinFilters:
+    # an empty filter lets every coin through
+    return (
+        inf if max_coin_price is None else max_coin_price,
+        -inf if min_coin_market_cap is None else min_coin_market_cap,
+        -inf if min_coin_age is None else min_coin_age,
+        inf if max_coin_age is None else max_coin_age,
+    )
+
+
+class SubscriberMatrix:
+    def __init__(self):
+        self._filters: dict[int, CoinFilters] = {}
+        self._wallets: dict[int, set[int]] = defaultdict(set)
+        self._client_wallets: dict[int, set[int]] = defaultdict(set)
+        self._matrix: dict[int, WalletSubscribers] = {}
+        self.loaded = False
+
+    @staticmethod
+    def get_subscriptions():
+        return ClientWallet.objects.filter(
+            client__alerts_enabled=True,
+        ).values_list(
+            'client_id',
+            'wallet_id',
+            'client__max_coin_price',
+            'client__min_coin_market_cap',
+            'client__min_coin_age',
+            'client__max_coin_age',
+        )
+
+    def _add(self, client_id: int, wallet_id: int, *filters) -> None:
+        self._filters[client_id] = _get_filters(*filters)
+        self._wallets[wallet_id].add(client_id)
+        self._client_wallets[client_id].add(wallet_id)
+        self._matrix.pop(wallet_id, None)
+
+    def _remove(self, client_id: int) -> None:
+        self._filters.pop(client_id, None)
+        for wallet_id in self._client_wallets.pop(client_id, ()):
+            self._wallets[wallet_id].discard(client_id)
+            if not self._wallets[wallet_id]:
+                del self._wallets[wallet_id]
+            self._matrix.pop(wallet_id, None)
+
+    async def load(self) -> None:
+        self._filters.clear()
+        self._wallets.clear()
+        self._client_wallets.clear()
+        self._matrix.clear()
+        async for row in self.get_subscriptions():
+            self._add(*row)
+        self.loaded = True
+
+    async def refresh(self, client_id: int) -> None:
+        if not self.loaded:
+            return
+
+        self._remove(client_id)
+        async for row in self.get_subscriptions().filter(client_id=client_id):
+            self._add(*row)
+
+    def recipients(
+        self,
+        wallet_id: int,
+        *,
+        price: float,
+        market_cap: float,
+        age: float,
+    ) -> list[int]:
+        if wallet_id not in self._wallets:
+            return []
+
+        # wallets are rebuilt lazily after their subscribers have changed
+        if wallet_id not in self._matrix:
+            self._matrix[wallet_id] = WalletSubscribers.build(
+                {i: self._filters[i] for i in self._wallets[wallet_id]},
+            )
+        return self._matrix[wallet_id].recipients(price, market_cap, age)
+
+
+subscriber_matrix = SubscriberMatrix()
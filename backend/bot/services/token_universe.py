@@ -0,0 +1,88 @@
+import asyncio
+import json
+from dataclasses import asdict
+
+from redis.asyncio import Redis
+
+from bot.api.birdeye import BirdEyeAPI
+from bot.exceptions import BirdEyeBadRequest
+from bot.loader import logger, redis
+from bot.schemas import TokenListParams
+from bot.services.client_filters import TokenColumns, add_date_to_coins
+from bot.settings import settings
+
+
+class TokenUniverse:
+    """Tokens shared by all search filters, scanned by one worker."""
+
+    def __init__(
+        self,
+        redis_client: Redis,
+        *,
+        pages: int = settings.TOKEN_UNIVERSE_PAGES,
+        page_size: int = 50,
+        prefix: str = 'token_universe',
+    ):
+        self.redis = redis_client
+        self.pages = pages
+        self.page_size = page_size
+        self.prefix = prefix
+        self.columns = TokenColumns([])
+
+    async def load(self) -> TokenColumns:
+        data = await self.redis.get(f'{self.prefix}:tokens')
+        self.columns = TokenColumns(json.loads(data) if data else [])
+        return self.columns
+
+    async def scan(
+        self,
+        api: BirdEyeAPI,
+        min_liquidity: float,
+    ) -> TokenColumns:
+        offset = int(await self.redis.get(f'{self.prefix}:offset') or 0)
+        pages = await asyncio.gather(
+            *[
+                api.get_token_list(
+                    TokenListParams(
+                        min_liquidity=int(min_liquidity),
+                        offset=offset + i * self.page_size,
+                        limit=self.page_size,
+                    ),
+                    raise_if_empty=True,
+                )
+                for i in range(self.pages)
+            ],
+            return_exceptions=True,
+        )
+
+        tokens = []
+        offset += self.pages * self.page_size
+        for page in pages:
+            if isinstance(page, BirdEyeBadRequest):
+                # if offset is too large
+                logger.info('Set offset=0 to token universe')
+                offset = 0
+                break
+            if isinstance(page, BaseException):
+                raise page
+            tokens.extend(page)
+
+        rows = await add_date_to_coins([asdict(i) for i in tokens])
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.set(f'{self.prefix}:offset', offset)
+            pipe.set(
+                f'{self.prefix}:tokens',
+                json.dumps(rows),
+                ex=settings.NOTIFY_FILTERS_TIMEOUT * 2,
+            )
+            await pipe.execute()
+
+        self.columns = TokenColumns(rows)
+        logger.info(
+            f'Token universe contains {len(self.columns)} tokens '
+            f'with min_liquidity={min_liquidity}',
+        )
+        return self.columns
+
+
+token_universe = TokenUniverse(redis)
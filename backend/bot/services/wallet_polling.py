@@ -0,0 +1,139 @@
+import math
+import time
+from collections import deque
+from dataclasses import dataclass
+
+from bot.settings import settings
+from core.models import Wallet
+
+
+@dataclass
+class WalletActivity:
+    # exponentially weighted transactions per minute
+    rate: float = 0
+    polled_at: float | None = None
+    interval: float = 0
+    # failed polls in a row, each one doubles the interval
+    failures: int = 0
+    failed_at: float | None = None
+
+
+class WalletPoller:
+    """Decides which wallets are polled on the current tick."""
+
+    def __init__(
+        self,
+        *,
+        budget: float = settings.WALLET_POLL_BUDGET,
+        min_interval: float = settings.WALLET_POLL_MIN_INTERVAL,
+        max_interval: float = settings.WALLET_POLL_MAX_INTERVAL,
+        window: float = settings.WALLET_ACTIVITY_WINDOW,
+        rate_floor: float = settings.WALLET_ACTIVITY_FLOOR,
+    ):
+        self.budget = budget
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.window = window
+        self.rate_floor = rate_floor
+        self._wallets: dict[int, WalletActivity] = {}
+        # (time, calls) made during the last minute
+        self._calls: deque[tuple[float, int]] = deque()
+        self._spent = 0
+
+    def get(self, wallet_id: int) -> WalletActivity:
+        if wallet_id not in self._wallets:
+            self._wallets[wallet_id] = WalletActivity()
+        return self._wallets[wallet_id]
+
+    def spend(self, calls: int, now: float | None = None) -> None:
+        if calls <= 0:
+            return
+        self._calls.append((now or time.monotonic(), calls))
+        self._spent += calls
+
+    def _set_intervals(self, wallets: list[Wallet]) -> None:
+        priorities = {
+            w.pk: (self.get(w.pk).rate + self.rate_floor)
+            * max(getattr(w, 'clients_count', 1), 1)
+            for w in wallets
+        }
+        total = sum(priorities.values())
+        for wallet_id, priority in priorities.items():
+            polls_per_minute = self.budget * priority / total
+            self.get(wallet_id).interval = min(
+                max(60 / polls_per_minute, self.min_interval),
+                self.max_interval,
+            )
+
+    def get_due(
+        self,
+        wallets: list[Wallet],
+        now: float | None = None,
+    ) -> list[Wallet]:
+        if not wallets:
+            return []
+
+        now = now or time.monotonic()
+        self._set_intervals(wallets)
+        tracked = {w.pk for w in wallets}
+        self._wallets = {
+            k: v for k, v in self._wallets.items() if k in tracked
+        }
+
+        due = []
+        for wallet in wallets:
+            activity = self.get(wallet.pk)
+            if activity.failures:
+                interval = min(
+                    activity.interval * 2**activity.failures,
+                    self.max_interval,
+                )
+                overdue = (now - activity.failed_at) / interval
+            elif activity.polled_at is None:
+                due.append((math.inf, wallet))
+                continue
+            else:
+                overdue = (now - activity.polled_at) / activity.interval
+
+            if overdue >= 1:
+                due.append((overdue, wallet))
+
+        while self._calls and self._calls[0][0] <= now - 60:
+            self._spent -= self._calls.popleft()[1]
+        limit = max(int(self.budget) - self._spent, 0)
+
+        # the most overdue wallets go first when the budget is exceeded
+        due.sort(key=lambda i: i[0], reverse=True)
+        due = [wallet for _, wallet in due[:limit]]
+        # the first signatures page of every poll, record adds the rest
+        self.spend(len(due), now)
+        return due
+
+    def record(
+        self,
+        wallet_id: int,
+        transactions: int,
+        *,
+        pages: int = 1,
+        now: float | None = None,
+    ) -> None:
+        now = now or time.monotonic()
+        self.spend(pages - 1, now)
+        activity = self.get(wallet_id)
+        if activity.polled_at is not None:
+            elapsed = now - activity.polled_at
+            alpha = 1 - math.exp(-elapsed / self.window)
+            sample = transactions / max(elapsed / 60, 1e-3)
+            activity.rate += alpha * (sample - activity.rate)
+        activity.polled_at = now
+        activity.failures = 0
+
+    def record_failure(self, wallet_id: int, now: float | None = None) -> None:
+        # failing wallets back off instead of staying the most overdue,
+        # polled_at is kept, so the rate still covers the whole gap
+        activity = self.get(wallet_id)
+        activity.failed_at = now or time.monotonic()
+        activity.failures += 1
+
+
+wallet_poller = WalletPoller()
@@ -0,0 +1,200 @@
+import asyncio
+import time
+from collections import defaultdict
+from itertools import count
+
+from aiohttp import ClientWebSocketResponse, WSMsgType
+
+from bot.api.base import sessions
+from bot.loader import logger
+from bot.settings import settings
+
+
+class WalletStream:
+    """logsSubscribe subscriptions for all tracked wallets on one socket."""
+
+    def __init__(
+        self,
+        url: str = settings.ALCHEMY_WS_URL,
+        *,
+        queue_size: int = settings.WALLET_STREAM_QUEUE_SIZE,
+        reconnect_delay: float = settings.WALLET_STREAM_RECONNECT_DELAY,
+        max_reconnect_delay: float = (
+            settings.WALLET_STREAM_MAX_RECONNECT_DELAY
+        ),
+    ):
+        self.url = url
+        self.queue_size = queue_size
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.addresses: set[str] = set()
+        self.subscribed: dict[str, int] = {}
+        self.gaps: dict[str, float] = {}
+        self.reconnects = 0
+        self._subscriptions: dict[int, str] = {}
+        self._requests: dict[int, tuple[str, str]] = {}
+        self._ids = count(1)
+        self._ws: ClientWebSocketResponse | None = None
+        self._queue: asyncio.Queue[tuple[str, str]] | None = None
+        self._task: asyncio.Task | None = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None
+
+    @property
+    def is_connected(self) -> bool:
+        return self._ws is not None and not self._ws.closed
+
+    def start(self) -> None:
+        if self.is_running:
+            return
+        self._queue = asyncio.Queue(self.queue_size)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if not self._task:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def set_addresses(self, addresses: set[str]) -> None:
+        added = addresses - self.addresses
+        removed = self.addresses - addresses
+        self.addresses = set(addresses)
+        if not self.is_connected:
+            return
+
+        try:
+            for address in added:
+                await self._subscribe(address)
+            for address in removed:
+                await self._unsubscribe(address)
+        except ConnectionError as e:
+            # the reader notices the closed socket and resubscribes
+            logger.info(f'Cannot update wallet subscriptions: {e}')
+
+    def is_streamed(self, address: str) -> bool:
+        return address in self.subscribed and address not in self.gaps
+
+    def add_gap(self, address: str) -> None:
+        self.gaps.setdefault(address, time.monotonic())
+
+    def backfilled(self, address: str, since: float) -> None:
+        if self.gaps.get(address, since) < since:
+            del self.gaps[address]
+
+    async def get_batch(self, max_wait: float) -> dict[str, list[str]]:
+        batch = defaultdict(list)
+        address, signature = await self._queue.get()
+        batch[address].append(signature)
+
+        deadline = time.monotonic() + max_wait
+        while (timeout := deadline - time.monotonic()) > 0:
+            try:
+                address, signature = await asyncio.wait_for(
+                    self._queue.get(),
+                    timeout,
+                )
+            except TimeoutError:
+                break
+            batch[address].append(signature)
+        return batch
+
+    async def _send(self, method: str, params: list, address: str) -> None:
+        request_id = next(self._ids)
+        self._requests[request_id] = (method, address)
+        await self._ws.send_json(
+            {
+                'jsonrpc': '2.0',
+                'id': request_id,
+                'method': method,
+                'params': params,
+            },
+        )
+
+    async def _subscribe(self, address: str) -> None:
+        await self._send(
+            'logsSubscribe',
+            [{'mentions': [address]}, {'commitment': 'confirmed'}],
+            address,
+        )
+
+    async def _unsubscribe(self, address: str) -> None:
+        self.gaps.pop(address, None)
+        subscription = self.subscribed.pop(address, None)
+        if subscription is None:
+            return
+
+        self._subscriptions.pop(subscription, None)
+        await self._send('logsUnsubscribe', [subscription], address)
+
+    def _handle(self, data: dict) -> None:
+        if data.get('method') == 'logsNotification':
+            params = data['params']
+            address = self._subscriptions.get(params['subscription'])
+            value = params['result']['value']
+            if address and not value.get('err'):
+                self._put(address, value['signature'])
+            return
+
+        method, address = self._requests.pop(data.get('id'), (None, None))
+        if method != 'logsSubscribe':
+            return
+
+        if 'result' not in data:
+            logger.info(
+                f'Cannot subscribe to wallet {address}: {data.get("error")}',
+            )
+        elif address in self.addresses:
+            self.subscribed[address] = data['result']
+            self._subscriptions[data['result']] = address
+            self.add_gap(address)
+
+    def _put(self, address: str, signature: str) -> None:
+        try:
+            self._queue.put_nowait((address, signature))
+        except asyncio.QueueFull:
+            logger.warning(
+                f'Wallet stream queue is full, {address} will be polled',
+            )
+            self.add_gap(address)
+
+    async def _run(self) -> None:
+        delay = self.reconnect_delay
+        while True:
+            try:
+                async with sessions.get(self.__class__.__name__).ws_connect(
+                    self.url,
+                    heartbeat=settings.WALLET_STREAM_HEARTBEAT,
+                ) as ws:
+                    self._ws = ws
+                    delay = self.reconnect_delay
+                    logger.info(
+                        f'Wallet stream connected, subscribing to '
+                        f'{len(self.addresses)} wallets',
+                    )
+                    for address in self.addresses:
+                        await self._subscribe(address)
+
+                    async for msg in ws:
+                        if msg.type == WSMsgType.TEXT:
+                            self._handle(msg.json())
+                        elif msg.type == WSMsgType.ERROR:
+                            break
+            except Exception as e:
+                logger.info(f'Wallet stream error: {e!r}')
+            finally:
+                self._ws = None
+                self.subscribed.clear()
+                self._subscriptions.clear()
+                self._requests.clear()
+
+            self.reconnects += 1
+            logger.info(f'Wallet stream closed, reconnecting in {delay}s')
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+
+wallet_stream = WalletStream()
@@ -16,11 +16,115 @@ class Settings:
     BIRDEYE_API_KEY: str = field(
         default_factory=lambda: env('BIRDEYE_API_KEY'),
     )
+    # updates are received with a webhook instead of polling when it is set
+    WEBHOOK_URL: str = field(default_factory=lambda: env('WEBHOOK_URL', ''))
+    WEBHOOK_SECRET: str = field(
+        default_factory=lambda: env('WEBHOOK_SECRET', ''),
+    )
+    WEBHOOK_PATH: str = field(default='/bot/webhook')
+    WEBHOOK_HOST: str = field(default='0.0.0.0')
+    WEBHOOK_PORT: int = field(default=8080)
+    UPDATES_PARTITIONS: int = field(default=64)
+    # updates of different chats handled at once by one worker
+    UPDATES_CONCURRENCY: int = field(default=20)
 
     WSOL_ADDRESS: str = field(
         default='So11111111111111111111111111111111111111112',
     )
+    # seconds between the starts of two notifier runs
     NOTIFY_TIMEOUT: int = field(default=30)
+    NOTIFY_WALLETS_TIMEOUT: int = field(default=5)
+    NOTIFY_FILTERS_TIMEOUT: int = field(default=60)
+    NOTIFY_COINS_WORKERS: int = field(default=20)
+    NOTIFY_WALLETS_WORKERS: int = field(default=20)
+    NOTIFY_TOKENS_WORKERS: int = field(default=10)
+    NOTIFY_FILTERS_WORKERS: int = field(default=10)
+    SHARDING_ENABLED: bool = field(
+        default_factory=lambda: env.bool('SHARDING_ENABLED', False),
+    )
+    SHARDING_SHARDS: int = field(default=256)
+    SHARDING_RING_REPLICAS: int = field(default=64)
+    # seconds
+    SHARDING_SYNC_INTERVAL: float = field(default=5)
+    SHARDING_LEASE_TTL: float = field(default=15)
+    INVALIDATION_RECONNECT_DELAY: float = field(default=1)
+    SCHEDULER_JITTER: float = field(default=1)
+    SCHEDULER_MAX_BACKLOG: int = field(default=3)
+    SCHEDULER_STATS_INTERVAL: int = field(default=300)
+    PRICES_CHUNK_SIZE: int = field(default=25)
+    PRICES_MAX_IN_FLIGHT: int = field(default=20)
+    # seconds
+    PRICES_CACHE_TTL: float = field(default=10)
+    PRICES_BATCH_WAIT: float = field(default=0.05)
+    SIGNATURES_PAGE_SIZE: int = field(default=100)
+    # getSignaturesForAddress and getTransaction calls per minute shared by
+    # all wallets
+    WALLET_POLL_BUDGET: int = field(default=600)
+    # seconds
+    WALLET_POLL_MIN_INTERVAL: float = field(default=5)
+    WALLET_POLL_MAX_INTERVAL: float = field(default=300)
+    WALLET_ACTIVITY_WINDOW: float = field(default=3600)
+    # transactions per minute assumed for a silent wallet
+    WALLET_ACTIVITY_FLOOR: float = field(default=0.01)
+    WALLET_STREAM_ENABLED: bool = field(
+        default_factory=lambda: env.bool('WALLET_STREAM_ENABLED', False),
+    )
+    ALCHEMY_WS_URL: str = field(
+        default_factory=lambda: (
+            f'wss://solana-mainnet.g.alchemy.com/v2/{env("ALCHEMY_API_KEY")}'
+        ),
+    )
+    WALLET_STREAM_QUEUE_SIZE: int = field(default=10000)
+    # seconds
+    WALLET_STREAM_BATCH_WAIT: float = field(default=0.5)
+    WALLET_STREAM_HEARTBEAT: float = field(default=30)
+    WALLET_STREAM_RECONNECT_DELAY: float = field(default=1)
+    WALLET_STREAM_MAX_RECONNECT_DELAY: float = field(default=60)
+    # signatures are kept in hourly buckets for two days
+    SEEN_SIGNATURES_BUCKET_SIZE: int = field(default=3600)
+    SEEN_SIGNATURES_BUCKETS: int = field(default=48)
+    ALCHEMY_RPC_BATCH_SIZE: int = field(default=50)
+    # seconds
+    ALCHEMY_RPC_BATCH_WAIT: float = field(default=0.05)
+    TOKEN_UNIVERSE_PAGES: int = field(default=5)
+    SEARCH_RESULTS_LIMIT: int = field(default=500)
+    COIN_CACHE_SIZE: int = field(default=50000)
+    # seconds
+    COIN_CACHE_TTL: int = field(default=24 * 3600)
+    COIN_CACHE_NEGATIVE_TTL: int = field(default=600)
+    HTTP_POOL_SIZE: int = field(default=100)
+    HTTP_POOL_SIZE_PER_HOST: int = field(default=30)
+    HTTP_DNS_CACHE_TTL: int = field(default=300)
+    HTTP_KEEPALIVE_TIMEOUT: int = field(default=60)
+    # connections per host for every API client
+    HTTP_PROVIDER_LIMITS: dict[str, int] = field(
+        default_factory=lambda: {
+            'AlchemyAPI': 30,
+            'BirdEyeAPI': 5,
+            'DexscreenerAPI': 10,
+        },
+    )
+    DELIVERY_WORKERS: int = field(default=8)
+    DELIVERY_QUEUE_SIZE: int = field(default=10000)
+    # messages per second
+    DELIVERY_RATE: float = field(default=30)
+    DELIVERY_CHAT_RATE: float = field(default=1)
+    DELIVERY_GROUP_RATE: float = field(default=20 / 60)
+    # seconds to wait for other alerts to the same chat before sending
+    DELIVERY_COALESCE_WINDOW: float = field(default=2)
+    DELIVERY_MAX_ATTEMPTS: int = field(default=3)
+    DELIVERY_STATS_INTERVAL: int = field(default=60)
+    OUTBOX_STREAM: str = field(default='outbox')
+    OUTBOX_GROUP: str = field(default='delivery')
+    OUTBOX_PARTITIONS: int = field(default=64)
+    # seconds an idempotency key is remembered
+    OUTBOX_KEY_TTL: int = field(default=24 * 60 * 60)
+    OUTBOX_BATCH_SIZE: int = field(default=100)
+    # notifications waiting in delivery at once per consumer
+    OUTBOX_CONCURRENCY: int = field(default=1000)
+    # seconds before an unacknowledged notification is retried
+    OUTBOX_CLAIM_IDLE: float = field(default=60)
+    OUTBOX_MAX_ATTEMPTS: int = field(default=3)
     PAGE_SIZE: int = field(default=5)
     DATE_FMT: str = field(default='%d.%m.%Y')
 
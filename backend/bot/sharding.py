@@ -0,0 +1,162 @@
+import hashlib
+import os
+import socket
+import time
+from bisect import bisect
+from collections.abc import Awaitable, Callable
+
+from redis.asyncio import Redis
+
+from bot.loader import logger, redis
+from bot.settings import settings
+
+RENEW_LEASE = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+RELEASE_LEASE = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def get_hash(value: str) -> int:
+    digest = hashlib.blake2b(value.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+
+class HashRing:
+    def __init__(
+        self,
+        members: list[str],
+        *,
+        replicas: int = settings.SHARDING_RING_REPLICAS,
+    ):
+        self._ring = sorted(
+            (get_hash(f'{member}:{i}'), member)
+            for member in members
+            for i in range(replicas)
+        )
+        self._hashes = [i for i, _ in self._ring]
+
+    def get(self, key: str) -> str | None:
+        if not self._ring:
+            return None
+        i = bisect(self._hashes, get_hash(key)) % len(self._ring)
+        return self._ring[i][1]
+
+
+class Sharding:
+    """Splits notifier entities between workers by leased shards."""
+
+    def __init__(
+        self,
+        redis_client: Redis,
+        *,
+        enabled: bool = settings.SHARDING_ENABLED,
+        shards: int = settings.SHARDING_SHARDS,
+        ttl: float = settings.SHARDING_LEASE_TTL,
+        prefix: str = 'sharding',
+    ):
+        self.redis = redis_client
+        self.enabled = enabled
+        self.shards = shards
+        self.ttl = ttl
+        self.prefix = prefix
+        self.worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        self.members: list[str] = []
+        self.leased: set[int] = set()
+        self._renew = redis_client.register_script(RENEW_LEASE)
+        self._release = redis_client.register_script(RELEASE_LEASE)
+
+    def _get_lease_key(self, shard: int) -> str:
+        return f'{self.prefix}:lease:{shard}'
+
+    def get_shard(self, key: str | int) -> int:
+        return get_hash(str(key)) % self.shards
+
+    def owns(self, key: str | int) -> bool:
+        if not self.enabled:
+            return True
+        return self.get_shard(key) in self.leased
+
+    async def sync(
+        self,
+        before_release: Callable[[set[int]], Awaitable] | None = None,
+    ) -> None:
+        if not self.enabled:
+            return
+
+        members_key = f'{self.prefix}:members'
+        now = time.time()
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.zadd(members_key, {self.worker_id: now})
+            pipe.zremrangebyscore(members_key, 0, now - self.ttl)
+            pipe.zrange(members_key, 0, -1)
+            *_, members = await pipe.execute()
+
+        members = sorted(i.decode() for i in members)
+        if members != self.members:
+            logger.info(f'Sharding members changed: {members}')
+        self.members = members
+
+        ring = HashRing(members)
+        assigned = {
+            i
+            for i in range(self.shards)
+            if ring.get(f'shard:{i}') == self.worker_id
+        }
+        released = self.leased - assigned
+        if released and before_release:
+            await before_release(released)
+        for shard in released:
+            await self._release_lease(shard)
+
+        ttl_ms = int(self.ttl * 1000)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for shard in sorted(assigned):
+                key = self._get_lease_key(shard)
+                if shard in self.leased:
+                    await self._renew(
+                        keys=[key],
+                        args=[self.worker_id, ttl_ms],
+                        client=pipe,
+                    )
+                else:
+                    pipe.set(key, self.worker_id, px=ttl_ms, nx=True)
+            results = await pipe.execute()
+
+        leased = {
+            shard
+            for shard, ok in zip(sorted(assigned), results, strict=True)
+            if ok
+        }
+        if leased != self.leased:
+            logger.info(
+                f'Worker {self.worker_id} holds {len(leased)} of '
+                f'{self.shards} shards ({len(assigned)} assigned)',
+            )
+        self.leased = leased
+
+    async def _release_lease(self, shard: int) -> None:
+        await self._release(
+            keys=[self._get_lease_key(shard)],
+            args=[self.worker_id],
+        )
+        self.leased.discard(shard)
+
+    async def stop(self) -> None:
+        if not self.enabled:
+            return
+
+        for shard in list(self.leased):
+            await self._release_lease(shard)
+        await self.redis.zrem(f'{self.prefix}:members', self.worker_id)
+
+
+sharding = Sharding(redis)
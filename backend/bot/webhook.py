@@ -0,0 +1,159 @@
+import asyncio
+import hmac
+import json
+import time
+from collections import deque
+
+from aiogram import Bot, Dispatcher
+from aiohttp import web
+from redis.asyncio import Redis
+
+from bot.loader import logger, redis
+from bot.settings import settings
+from bot.sharding import Sharding
+
+SECRET_TOKEN_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+
+def get_chat_id(update: dict) -> int | None:
+    for key, event in update.items():
+        if key == 'update_id' or not isinstance(event, dict):
+            continue
+
+        # callback queries carry the chat in their message
+        chat = event.get('chat') or event.get('message', {}).get('chat')
+        if chat:
+            return chat['id']
+        if user := event.get('from') or event.get('user'):
+            return user['id']
+    return None
+
+
+class UpdateQueue:
+    """Telegram updates partitioned by chat and leased by workers."""
+
+    def __init__(
+        self,
+        redis_client: Redis,
+        *,
+        partitions: int = settings.UPDATES_PARTITIONS,
+        concurrency: int = settings.UPDATES_CONCURRENCY,
+        prefix: str = 'updates',
+    ):
+        self.redis = redis_client
+        self.prefix = prefix
+        self.concurrency = concurrency
+        self.sharding = Sharding(
+            redis_client,
+            enabled=True,
+            shards=partitions,
+            prefix=f'{prefix}:sharding',
+        )
+        # updates of every chat in flight are handled by one task in order
+        self._updates: dict[int, deque[dict]] = {}
+        self._tasks: dict[int, asyncio.Task] = {}
+
+    def get_key(self, partition: int) -> str:
+        return f'{self.prefix}:{partition}'
+
+    @staticmethod
+    def _get_chat(update: dict) -> int:
+        return get_chat_id(update) or update['update_id']
+
+    async def put(self, data: bytes) -> None:
+        partition = self.sharding.get_shard(self._get_chat(json.loads(data)))
+        await self.redis.rpush(self.get_key(partition), data)
+
+    async def _process(
+        self,
+        dp: Dispatcher,
+        bot: Bot,
+        chat_id: int,
+        semaphore: asyncio.Semaphore,
+    ) -> None:
+        updates = self._updates[chat_id]
+        try:
+            while updates:
+                update = updates.popleft()
+                try:
+                    await dp.feed_raw_update(bot, update)
+                except Exception as e:
+                    logger.exception(
+                        f'Error in update {update["update_id"]}',
+                        exc_info=e,
+                    )
+        finally:
+            del self._updates[chat_id]
+            del self._tasks[chat_id]
+            semaphore.release()
+
+    async def _drain(self, partitions: set[int]) -> None:
+        # the next owner may pop the chats as soon as the lease is released
+        await asyncio.gather(
+            *[
+                task
+                for chat_id, task in self._tasks.items()
+                if self.sharding.get_shard(chat_id) in partitions
+            ],
+            return_exceptions=True,
+        )
+
+    async def consume(self, dp: Dispatcher, bot: Bot) -> None:
+        # a slot is taken by a chat, not by an update, so a busy chat
+        # cannot hold all of them
+        semaphore = asyncio.Semaphore(self.concurrency)
+        synced_at = 0.0
+        try:
+            while True:
+                if time.monotonic() - synced_at >= (
+                    settings.SHARDING_SYNC_INTERVAL
+                ):
+                    await self.sharding.sync(self._drain)
+                    synced_at = time.monotonic()
+
+                keys = [self.get_key(i) for i in sorted(self.sharding.leased)]
+                if not keys:
+                    await asyncio.sleep(1)
+                    continue
+
+                item = await self.redis.blpop(keys, timeout=1)
+                if item is None:
+                    continue
+
+                update = json.loads(item[1])
+                chat_id = self._get_chat(update)
+                if chat_id in self._updates:
+                    self._updates[chat_id].append(update)
+                    continue
+
+                await semaphore.acquire()
+                self._updates[chat_id] = deque([update])
+                self._tasks[chat_id] = asyncio.create_task(
+                    self._process(dp, bot, chat_id, semaphore),
+                )
+        finally:
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+            await self.sharding.stop()
+
+
+update_queue = UpdateQueue(redis)
+
+
+async def handle_update(request: web.Request) -> web.Response:
+    secret = request.headers.get(SECRET_TOKEN_HEADER, '').encode()
+    if not hmac.compare_digest(secret, settings.WEBHOOK_SECRET.encode()):
+        return web.Response(status=401)
+
+    await update_queue.put(await request.read())
+    return web.Response()
+
+
+def create_app() -> web.Application:
+    if not settings.WEBHOOK_URL or not settings.WEBHOOK_SECRET:
+        raise ValueError(
+            'WEBHOOK_URL and WEBHOOK_SECRET are required in webhook mode',
+        )
+
+    app = web.Application()
+    app.router.add_post(settings.WEBHOOK_PATH, handle_update)
+    return app
@@ -52,3 +52,8 @@ class TransactionAdmin(admin.ModelAdmin):
 @admin.register(models.ClientFilters)
 class ClientFiltersAdmin(admin.ModelAdmin):
     list_select_related = ('client',)
+
+
+@admin.register(models.SearchResult)
+class SearchResultAdmin(admin.ModelAdmin):
+    list_select_related = ('filters__client', 'coin')
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 03:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_clientfilters_offset'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wallet',
+            name='last_signature',
+            field=models.CharField(blank=True, max_length=255, verbose_name='Последняя транзакция'),
+        ),
+    ]
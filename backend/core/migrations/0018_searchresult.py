@@ -0,0 +1,66 @@
+# Generated by Django 5.2 on 2026-10-18 03:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def move_results(apps, schema_editor):
+    ClientFilters = apps.get_model('core', 'ClientFilters')
+    Coin = apps.get_model('core', 'Coin')
+    SearchResult = apps.get_model('core', 'SearchResult')
+
+    for f in ClientFilters.objects.exclude(results=[]):
+        results = f.results[-500:]
+        coins = dict(
+            Coin.objects.filter(
+                chain='solana-mainnet',
+                address__in=[i['address'] for i in results],
+            ).values_list('address', 'pk'),
+        )
+        SearchResult.objects.bulk_create(
+            [
+                SearchResult(
+                    filters=f,
+                    coin_id=coins[i['address']],
+                    price=i.get('price'),
+                    market_cap=i.get('market_cap'),
+                    liquidity=i.get('liquidity'),
+                )
+                for i in results
+                if i['address'] in coins
+            ],
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_wallet_last_signature'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price', models.FloatField(blank=True, null=True, verbose_name='Цена')),
+                ('market_cap', models.FloatField(blank=True, null=True, verbose_name='Капитализация')),
+                ('liquidity', models.FloatField(blank=True, null=True, verbose_name='Ликвидность')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('coin', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_results', to='core.coin', verbose_name='Монета')),
+                ('filters', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_results', to='core.clientfilters', verbose_name='Фильтры пользователя')),
+            ],
+            options={
+                'verbose_name': 'Результат поиска',
+                'verbose_name_plural': 'Результаты поиска',
+                'ordering': ['-created_at'],
+                'unique_together': {('filters', 'coin')},
+            },
+        ),
+        migrations.RunPython(move_results, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='clientfilters',
+            name='results',
+        ),
+    ]
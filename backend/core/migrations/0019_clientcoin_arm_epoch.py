@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 04:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_searchresult'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clientcoin',
+            name='arm_epoch',
+            field=models.PositiveIntegerField(default=0, verbose_name='Номер активации'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-18 04:20
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_clientcoin_arm_epoch'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='clientfilters',
+            name='offset',
+        ),
+    ]
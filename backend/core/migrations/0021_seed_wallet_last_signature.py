@@ -0,0 +1,34 @@
+# Generated by Django 5.2 on 2026-10-18 05:12
+
+from django.db import migrations, models
+
+
+def seed_last_signature(apps, schema_editor):
+    Transaction = apps.get_model('core', 'Transaction')
+    Wallet = apps.get_model('core', 'Wallet')
+
+    # signatures were deduplicated by the transactions table before, so
+    # polling starts after the newest stored one instead of from scratch
+    wallets = []
+    for wallet in Wallet.objects.filter(last_signature=''):
+        signature = (
+            Transaction.objects.filter(wallet=wallet)
+            .order_by(models.F('date').desc(nulls_last=True), '-pk')
+            .values_list('signature', flat=True)
+            .first()
+        )
+        if signature:
+            wallet.last_signature = signature
+            wallets.append(wallet)
+    Wallet.objects.bulk_update(wallets, ['last_signature'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_remove_clientfilters_offset'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_last_signature, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 05:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_seed_wallet_last_signature'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='transaction',
+            name='signature',
+            field=models.CharField(db_index=True, max_length=255, verbose_name='Адрес транзакции'),
+        ),
+    ]
@@ -8,8 +8,10 @@ from django.utils.timezone import now
 
 from bot.api.alchemy import AlchemyAPI, alchemy_chains
 from bot.api.dexscreener import DexscreenerAPI
-from bot.exceptions import WalletNotFound
+from bot.cache import coin_cache
+from bot.exceptions import CoinNotFound, WalletNotFound
 from bot.schemas import CoinInfo
+from bot.settings import settings
 from bot.text_utils import age_to_str
 from core.choices import CoinTrackingParams
 
@@ -94,16 +96,33 @@ class CoinManager(models.Manager):
         chain: str,
         coin_info: CoinInfo | None = None,
     ) -> 'Coin':
+        if coin := coin_cache.get(chain, address):
+            return coin
+
         alchemy_chain = alchemy_chains[chain]
         try:
-            return await self.aget(address=address, chain=alchemy_chain)
+            coin = await self.aget(address=address, chain=alchemy_chain)
         except ObjectDoesNotExist:
-            pass
+            coin = await self._acreate_from_info(chain, address, coin_info)
+
+        coin_cache.set(coin)
+        return coin
 
+    async def _acreate_from_info(
+        self,
+        chain: str,
+        address: str,
+        coin_info: CoinInfo | None = None,
+    ) -> 'Coin':
         if not coin_info:
-            async with DexscreenerAPI() as api:
-                coin_info = await api.get_coin_info(chain, address)
+            try:
+                async with DexscreenerAPI() as api:
+                    coin_info = await api.get_coin_info(chain, address)
+            except CoinNotFound:
+                coin_cache.set_not_found(chain, address)
+                raise
 
+        alchemy_chain = alchemy_chains[chain]
         try:
             return await self.acreate(
                 address=address,
@@ -117,6 +136,43 @@ class CoinManager(models.Manager):
         except IntegrityError:
             return await self.aget(address=address, chain=alchemy_chain)
 
+    async def abulk_upsert(
+        self,
+        chain: str,
+        coins_info: list[CoinInfo],
+    ) -> list['Coin']:
+        if not coins_info:
+            return []
+
+        alchemy_chain = alchemy_chains[chain]
+        # dexscreener returns a pair per pool, keep the first one
+        coins_info = {i.address: i for i in reversed(coins_info)}
+        await self.abulk_create(
+            [
+                self.model(
+                    address=i.address,
+                    chain=alchemy_chain,
+                    name=i.name,
+                    symbol=i.symbol,
+                    logo=i.logo,
+                    pair_address=i.pair_address,
+                    created_at=i.created_at,
+                )
+                for i in coins_info.values()
+            ],
+            ignore_conflicts=True,
+        )
+        coins = [
+            i
+            async for i in self.filter(
+                chain=alchemy_chain,
+                address__in=list(coins_info),
+            )
+        ]
+        for coin in coins:
+            coin_cache.set(coin)
+        return coins
+
     async def add_to_client(
         self,
         address: str,
@@ -164,6 +220,55 @@ class ClientFiltersManager(models.Manager):
         return await self.filter(pk=pk).aupdate(**kwargs)
 
 
+class SearchResultManager(models.Manager):
+    async def get_rows(self, filters_id: int | str) -> list[dict]:
+        date = now()
+        rows = []
+        async for i in self.filter(filters_id=filters_id).values(
+            'coin_id',
+            'price',
+            'market_cap',
+            'liquidity',
+            address=models.F('coin__address'),
+            symbol=models.F('coin__symbol'),
+            name=models.F('coin__name'),
+            logo=models.F('coin__logo'),
+            coin_created_at=models.F('coin__created_at'),
+        ):
+            created_at = i.pop('coin_created_at')
+            i['age'] = (date - created_at).total_seconds() / 60
+            rows.append(i)
+        return rows
+
+    async def add(self, filters_id: int | str, rows: list[dict]) -> None:
+        await self.abulk_create(
+            [
+                self.model(
+                    filters_id=filters_id,
+                    coin_id=i['coin_id'],
+                    price=i['price'],
+                    market_cap=i['market_cap'],
+                    liquidity=i['liquidity'],
+                )
+                for i in rows
+            ],
+            ignore_conflicts=True,
+        )
+
+        # keep only the latest results of every client
+        outdated = (
+            self.filter(filters_id=filters_id)
+            .order_by('-pk')
+            .values_list('pk', flat=True)[settings.SEARCH_RESULTS_LIMIT :]
+        )
+        if last_id := await outdated.afirst():
+            await self.filter(filters_id=filters_id, pk__lte=last_id).adelete()
+
+    async def replace(self, filters_id: int | str, rows: list[dict]) -> None:
+        await self.filter(filters_id=filters_id).adelete()
+        await self.add(filters_id, rows)
+
+
 class User(AbstractUser):
     pass
 
@@ -230,6 +335,11 @@ class Client(models.Model):
 class Wallet(models.Model):
     address = models.CharField('Адрес', max_length=255)
     chain = models.CharField('Блокчейн', max_length=255)
+    last_signature = models.CharField(
+        'Последняя транзакция',
+        max_length=255,
+        blank=True,
+    )
     objects = WalletManager()
 
     class Meta:
@@ -319,6 +429,9 @@ class ClientCoin(models.Model):
         'Уведомление отправлено',
         default=False,
     )
+    # incremented every time the alert is armed again, so notifications
+    # of different arms have different idempotency keys
+    arm_epoch = models.PositiveIntegerField('Номер активации', default=0)
     created_at = models.DateTimeField('Дата создания', auto_now_add=True)
 
     class Meta:
@@ -364,7 +477,11 @@ class Transaction(models.Model):
         blank=True,
     )
     date = models.DateTimeField('Дата', max_length=255, null=True, blank=True)
-    signature = models.CharField('Адрес транзакции', max_length=255)
+    signature = models.CharField(
+        'Адрес транзакции',
+        max_length=255,
+        db_index=True,
+    )
     sent = models.BooleanField('Отправлена', default=False)
 
     def __str__(self):
@@ -386,8 +503,6 @@ class ClientFilters(models.Model):
     min_age = models.IntegerField('Мин. возраст', default=0)
     max_age = models.IntegerField('Мин. возраст', null=True, blank=True)
     min_market_cap = models.IntegerField('Капитализация', default=0)
-    offset = models.IntegerField('Смещение', default=0)
-    results = models.JSONField('Результаты')
     objects = ClientFiltersManager()
 
     class Meta:
@@ -413,3 +528,32 @@ class ClientFilters(models.Model):
         if self.min_market_cap:
             text += f'Капитализация: {self.min_market_cap}\n'
         return text
+
+
+class SearchResult(models.Model):
+    filters = models.ForeignKey(
+        ClientFilters,
+        models.CASCADE,
+        'search_results',
+        verbose_name='Фильтры пользователя',
+    )
+    coin = models.ForeignKey(
+        Coin,
+        models.CASCADE,
+        'search_results',
+        verbose_name='Монета',
+    )
+    price = models.FloatField('Цена', null=True, blank=True)
+    market_cap = models.FloatField('Капитализация', null=True, blank=True)
+    liquidity = models.FloatField('Ликвидность', null=True, blank=True)
+    created_at = models.DateTimeField('Дата создания', auto_now_add=True)
+    objects = SearchResultManager()
+
+    class Meta:
+        unique_together = ('filters', 'coin')
+        verbose_name = 'Результат поиска'
+        verbose_name_plural = 'Результаты поиска'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f'{self.filters} - {self.coin}'
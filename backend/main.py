@@ -1,20 +1,59 @@
+import argparse
+import asyncio
 import os
+import signal
+from enum import StrEnum
 
 import django
 from aiogram import F
 from aiogram.enums import ChatType
 from aiogram.types import BotCommand
+from aiohttp import web
 
 from bot.loader import bot, dp, logger, loop
+from bot.settings import settings
 
 
-async def main():
+class Role(StrEnum):
+    # handle telegram updates only
+    UPDATES = 'updates'
+    # run the notification loops only, telegram is used to send messages
+    NOTIFIER = 'notifier'
+    # receive webhook updates and put them into the update queue
+    WEBHOOK = 'webhook'
+    ALL = 'all'
+
+
+async def main(role: Role = Role.ALL):
     os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
     django.setup()
 
+    from bot.api.base import sessions
+
+    notifier = role in (Role.NOTIFIER, Role.ALL)
+    if notifier:
+        await start_notifiers()
+
+    try:
+        if role == Role.NOTIFIER:
+            await run_until_signal(asyncio.Event().wait())
+        elif role == Role.WEBHOOK:
+            await run_until_signal(serve_webhook())
+        elif not settings.WEBHOOK_URL:
+            await start_polling()
+        elif role == Role.UPDATES:
+            await run_until_signal(consume_updates())
+        else:
+            await run_until_signal(serve_webhook(), consume_updates())
+    finally:
+        if notifier:
+            await stop_notifiers()
+        await sessions.close()
+
+
+def setup_dispatcher():
     from bot.handlers import alerts, base, coin, filters, search, wallet
     from bot.middlewares import WithClientMiddleware
-    from bot.notify import notify_coins, notify_filters, notify_wallets
 
     dp.include_routers(
         base.router,
@@ -28,7 +67,8 @@ async def main():
     dp.message.middleware(WithClientMiddleware())
     dp.callback_query.middleware(WithClientMiddleware())
 
-    await bot.delete_webhook(drop_pending_updates=True)
+
+async def set_commands():
     await bot.set_my_commands(
         [
             BotCommand(command='/start', description='Запустить бота'),
@@ -60,13 +100,137 @@ async def main():
         ],
     )
 
-    loop.create_task(notify_coins())
-    loop.create_task(notify_wallets())
-    loop.create_task(notify_filters())
 
+async def start_polling():
+    setup_dispatcher()
+    await bot.delete_webhook(drop_pending_updates=True)
+    await set_commands()
     logger.info('Starting bot...')
     await dp.start_polling(bot)
 
 
+async def consume_updates():
+    from bot.webhook import update_queue
+
+    setup_dispatcher()
+    logger.info('Starting updates worker...')
+    await update_queue.consume(dp, bot)
+
+
+async def serve_webhook():
+    from bot.webhook import create_app
+
+    runner = web.AppRunner(create_app())
+    await runner.setup()
+    try:
+        site = web.TCPSite(
+            runner,
+            settings.WEBHOOK_HOST,
+            settings.WEBHOOK_PORT,
+        )
+        await site.start()
+        await bot.set_webhook(
+            settings.WEBHOOK_URL,
+            secret_token=settings.WEBHOOK_SECRET,
+        )
+        await set_commands()
+        logger.info(f'Receiving updates on {settings.WEBHOOK_URL}...')
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+async def start_notifiers():
+    from bot.delivery import delivery
+    from bot.notify import (
+        consume_wallet_stream,
+        notify_coins_prices_changes,
+        notify_search_filters,
+        notify_wallets_transactions,
+    )
+    from bot.outbox import outbox
+    from bot.scheduler import OverrunPolicy, scheduler
+    from bot.services.invalidation import invalidation
+    from bot.services.wallet_stream import wallet_stream
+    from bot.sharding import sharding
+
+    if sharding.enabled:
+        await sharding.sync()
+        scheduler.add(sharding.sync, settings.SHARDING_SYNC_INTERVAL, jitter=0)
+
+    # the loops are staggered so their runs do not start together
+    scheduler.add(notify_coins_prices_changes, settings.NOTIFY_TIMEOUT)
+    scheduler.add(
+        notify_wallets_transactions,
+        settings.NOTIFY_WALLETS_TIMEOUT,
+        policy=OverrunPolicy.CATCH_UP,
+        offset=settings.NOTIFY_TIMEOUT / 3,
+    )
+    scheduler.add(
+        notify_search_filters,
+        settings.NOTIFY_FILTERS_TIMEOUT,
+        offset=settings.NOTIFY_TIMEOUT * 2 / 3,
+    )
+
+    invalidation.start()
+    delivery.start()
+    outbox.start()
+    scheduler.start()
+    if settings.WALLET_STREAM_ENABLED:
+        wallet_stream.start()
+        loop.create_task(consume_wallet_stream())
+    logger.info(f'Starting notifiers {sharding.worker_id}...')
+
+
+async def stop_notifiers():
+    from bot.delivery import delivery
+    from bot.outbox import outbox
+    from bot.scheduler import scheduler
+    from bot.services.invalidation import invalidation
+    from bot.services.wallet_stream import wallet_stream
+    from bot.sharding import sharding
+
+    await scheduler.stop()
+    await sharding.stop()
+    await invalidation.stop()
+    await wallet_stream.stop()
+    await outbox.stop()
+    await delivery.stop()
+
+
+async def run_until_signal(*coros):
+    tasks = [asyncio.create_task(i) for i in coros]
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, lambda: [i.cancel() for i in tasks])
+
+    try:
+        await asyncio.gather(*tasks)
+    except asyncio.CancelledError:
+        pass
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--role',
+        type=Role,
+        choices=list(Role),
+        default=Role.ALL,
+        help=(
+            'updates handles telegram updates (polled, or taken from the '
+            'update queue when WEBHOOK_URL is set), webhook receives them '
+            'into the queue, notifier runs the notification loops '
+            '(entities are split between the notifier processes with '
+            'SHARDING_ENABLED), all does everything'
+        ),
+    )
+    return parser.parse_args()
+
+
 if __name__ == '__main__':
-    loop.run_until_complete(main())
+    args = parse_args()
+    loop.run_until_complete(main(args.role))
@@ -12,7 +12,7 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 django.setup()
 
 from bot.api.dexscreener import DexscreenerAPI  # noqa
-from core.models import Coin  # noqa
+from core.models import Coin, Transaction  # noqa
 
 
 async def update_coins_tokens_pairs():
@@ -68,13 +68,27 @@ def delete_duplicates():
     logger.info(f'{len(ids_to_delete)} duplicates deleted!')
 
 
+def delete_empty_transactions():
+    count, _ = Transaction.objects.filter(
+        coin__isnull=True,
+        coin_amount__isnull=True,
+        date__isnull=True,
+    ).delete()
+    logger.info(f'{count} empty transactions deleted!')
+
+
 if __name__ == '__main__':
     func = input(
-        'select function:\n- update_coins_tokens_pairs\n- delete_duplicates\n',
+        'select function:\n'
+        '- update_coins_tokens_pairs\n'
+        '- delete_duplicates\n'
+        '- delete_empty_transactions\n',
     )
     if func == 'update_coins_tokens_pairs':
         asyncio.run(update_coins_tokens_pairs())
     elif func == 'delete_duplicates':
         delete_duplicates()
+    elif func == 'delete_empty_transactions':
+        delete_empty_transactions()
     else:
         print('Wrong function')
@@ -6,7 +6,10 @@ import django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 django.setup()
 
+from aiohttp import WSMsgType, web  # noqa
+
 from bot.api.alchemy import AlchemyAPI  # noqa
+from bot.services.wallet_stream import WalletStream  # noqa
 
 
 async def test_pool_transactions():
@@ -47,6 +50,77 @@ async def test_instant_buy_sell_transactions():
     print(r1, r2, sep='\n')
 
 
+async def test_wallet_stream():
+    connections = 0
+
+    # a local stand-in for the solana websocket: confirms every
+    # subscription, pushes one notification and drops the first connection
+    async def handler(request: web.Request):
+        nonlocal connections
+        connections += 1
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        async for msg in ws:
+            if msg.type != WSMsgType.TEXT:
+                continue
+            data = msg.json()
+            if data['method'] != 'logsSubscribe':
+                continue
+
+            address = data['params'][0]['mentions'][0]
+            subscription = connections * 100 + data['id']
+            await ws.send_json({'id': data['id'], 'result': subscription})
+            await ws.send_json(
+                {
+                    'method': 'logsNotification',
+                    'params': {
+                        'subscription': subscription,
+                        'result': {
+                            'value': {
+                                'signature': f'{address}-{connections}',
+                                'err': None,
+                            },
+                        },
+                    },
+                },
+            )
+            if connections == 1 and data['id'] == 2:
+                await ws.close()
+        return ws
+
+    app = web.Application()
+    app.router.add_get('/', handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    stream = WalletStream(f'ws://127.0.0.1:{port}/', reconnect_delay=0.1)
+    await stream.set_addresses({'wallet1', 'wallet2'})
+    stream.start()
+
+    signatures = set()
+    while len(signatures) < 4:
+        batch = await asyncio.wait_for(stream.get_batch(0.1), 5)
+        signatures.update(j for i in batch.values() for j in i)
+
+    await stream.stop()
+    await runner.cleanup()
+
+    assert signatures == {
+        'wallet1-1',
+        'wallet2-1',
+        'wallet1-2',
+        'wallet2-2',
+    }, signatures
+    assert stream.reconnects == 1, stream.reconnects
+    assert set(stream.gaps) == {'wallet1', 'wallet2'}, stream.gaps
+    print('Wallet stream resubscribed after reconnect')
+
+
 asyncio.run(test_pool_transactions())
 print('-' * 50)
 asyncio.run(test_instant_buy_sell_transactions())
+print('-' * 50)
+asyncio.run(test_wallet_stream())